@@ -12,8 +12,9 @@ from types import NoneType, InstanceType, GeneratorType
 from traceback import print_exc as exc_info__
 from random import shuffle, randrange, choice
 from re import compile as compile__
+from collections import deque, OrderedDict
 
-import sys, os, gc, time, shutil, ConfigParser
+import sys, os, gc, time, select, shutil, itertools, ConfigParser
 
 BsCore = getattr(sys.modules["__main__"], "__file__", None)
 if BsCore:
@@ -28,6 +29,8 @@ from enconf import *
 
 import xmpp, ithr, itypes
 
+itypes.checkpoint = ithr.checkpoint
+
 # Cache & Statistics
 
 eColors = xmpp.debug.colors_enabled # Unix colors
@@ -154,19 +157,28 @@ VarCache = {
 }
 
 Info = {
-	"cmd": itypes.Number(),		"sess": time.time(),
-	"msg": itypes.Number(),		"alls": [],
-	"cfw": itypes.Number(),		"up": 1.24,
-	"prs": itypes.Number(),		"iq": itypes.Number(),
-	"errors": itypes.Number(),
-	"omsg": itypes.Number(),	"outiq": itypes.Number()
+	"cmd": itypes.Counter(),		"sess": time.time(),
+	"msg": itypes.Counter(),		"alls": [],
+	"cfw": itypes.Counter(),		"up": 1.24,
+	"prs": itypes.Counter(),		"iq": itypes.Counter(),
+	"errors": itypes.Counter(),
+	"omsg": itypes.Counter(),	"outiq": itypes.Counter(),
+	"bytes": itypes.Counter()
 }
 
+IqIds, IqIdsLock = itertools.count(1), ithr.allocate_lock()
+
 # Useful features
 
 class SelfExc(Exception):
 	pass
 
+def get_iq_id():
+	with IqIdsLock:
+		number = IqIds.next()
+	Info["outiq"].plus()
+	return "Bs-i%d" % (number)
+
 def check_sqlite():
 	if not itypes.sqlite3:
 		raise SelfExc("py-sqlite3 required")
@@ -185,7 +197,7 @@ def exc_info_(fp = None):
 	except Exception:
 		pass
 
-sleep, database = time.sleep, itypes.Database
+sleep, database = ithr.sleep, itypes.Database
 
 def get_exc():
 	try:
@@ -306,6 +318,7 @@ try:
 	ConTls = eval(GenCon.get("STATES", "TLS"))
 	Mserve = eval(GenCon.get("STATES", "MSERVE"))
 	GetExc = eval(GenCon.get("STATES", "GETEXC"))
+	GlobalStats = eval(GenCon.get("STATES", "GLOBALSTATS")) if GenCon.has_option("STATES", "GLOBALSTATS") else False
 	DefLANG = GenCon.get("STATES", "LANG").upper()[0:2]
 	GodName = GenCon.get("CONFIG", "ADMIN").lower()
 	DefNick = GenCon.get("CONFIG", "NICK").split()[0]
@@ -315,6 +328,11 @@ try:
 	PrivLimit = int(GenCon.get("LIMITS", "PRIVATE"))
 	ConfLimit = int(GenCon.get("LIMITS", "CHAT"))
 	MaxMemory = int(GenCon.get("LIMITS", "MEMORY"))*1024
+	PoolSize = int(GenCon.get("LIMITS", "WORKERS")) if GenCon.has_option("LIMITS", "WORKERS") else 16
+	PoolLimit = int(GenCon.get("LIMITS", "QUEUE")) if GenCon.has_option("LIMITS", "QUEUE") else 1024
+	SendRate = int(GenCon.get("LIMITS", "SENDRATE")) if GenCon.has_option("LIMITS", "SENDRATE") else 8192
+	RoomRate = float(GenCon.get("LIMITS", "ROOMRATE")) if GenCon.has_option("LIMITS", "ROOMRATE") else 1.0
+	RoomBurst = int(GenCon.get("LIMITS", "ROOMBURST")) if GenCon.has_option("LIMITS", "ROOMBURST") else 4
 	ConDisp = ConfigParser.ConfigParser()
 	if os.path.isfile(ConDispFile):
 		ConDisp.read(ConDispFile)
@@ -361,6 +379,17 @@ Handlers = {
 
 Sequence = ithr.Semaphore()
 
+Pool = ithr.WorkerPool(PoolSize, PoolLimit)
+
+Priorities = {
+	"command": 0, "command(cron)": 0,
+	"01eh": 2, "02eh": 3,
+	"03eh": 2, "04eh": 3,
+	"05eh": 3, "06eh": 3,
+	"07eh": 3, "08eh": 3,
+	"09eh": 2
+}
+
 # call & execute Threads & handlers
 
 def execute_handler(handler_instance, list = (), command = None):
@@ -382,14 +411,12 @@ def call_sfunctions(ls, list = ()):
 def composeTimer(sleep, handler, name = None, list = (), command = None):
 	if not name:
 		name = "iTimer-%s" % (ithr.aCounter._str())
-	timer = ithr.Timer(sleep, execute_handler, (handler, list, command,))
-	timer.name = name
-	return timer
+	return ithr.ScheduledTimer(sleep, sThread, (name, handler, list, command,), name = name)
 
-def composeThr(handler, name, list = (), command = None):
+def composeThr(handler, name, list = (), command = None, kill_mode = "async"):
 	if not name.startswith(sBase[13]):
 		name = "%s-%s" % (name, ithr.aCounter._str())
-	return ithr.KThread(execute_handler, name, (handler, list, command,))
+	return ithr.KThread(execute_handler, name, (handler, list, command,), kill_mode = kill_mode)
 
 def startThr(thr, number = 0):
 	if number > 2:
@@ -415,12 +442,15 @@ def sThread_Run(thr, handler, command = None):
 	except Exception:
 		collectExc(sThread_Run, command)
 
-def sThread(name, inst, list = (), command = None):
-	sThread_Run(composeThr(inst, name, list, command), inst, command)
+def sThread(name, inst, list = (), command = None, lane = None):
+	isReactor = Reactor.isReactor() # the reactor's events are queued past the limit, it stops reading until the queue drains
+	if not Pool.put(execute_handler, (inst, list, command), Priorities.get(name, 1), lane, isReactor):
+		if not isReactor:
+			execute_handler(inst, list, command)
 
-def call_efunctions(ls, list = ()):
+def call_efunctions(ls, list = (), lane = None):
 	for inst in Handlers[ls]:
-		sThread(ls, inst, list)
+		sThread(ls, inst, list, None, lane)
 
 # expansions & commands
 
@@ -595,12 +625,14 @@ def command_handler(exp_inst, handler, default, access, prefix = True):
 
 class sUser(object):
 
+	__slots__ = ("nick", "source", "role", "ishere", "date", "access")
+
 	def __init__(self, nick, role, source, access = None):
 		self.nick = nick
 		self.source = source
 		self.role = role
 		self.ishere = True
-		self.date = (time.time(), Yday(), strfTime(local = False))
+		self.date = time.time()
 		self.access = access
 		if not access and access != 0:
 			self.calc_acc()
@@ -623,6 +655,9 @@ class sConf(object):
 		self.code = code
 		self.more = ""
 		self.desc = {}
+		self.sources = {}
+		self.servers = {}
+		self.roles = {}
 		self.IamHere = None
 		self.isModer = True
 		self.sdate = 0
@@ -652,6 +687,53 @@ class sConf(object):
 
 	get_users = lambda self: self.desc.values()
 
+	get_server = staticmethod(lambda source: source.split(chr(64))[-1])
+
+	def get_indexed(self, index, key):
+		ls = []
+		for nick in list(index.get(key, ())):
+			sUser = self.desc.get(nick)
+			if sUser:
+				ls.append(sUser)
+		return ls
+
+	get_source_users = lambda self, source: self.get_indexed(self.sources, source)
+
+	get_server_users = lambda self, server: self.get_indexed(self.servers, server)
+
+	def get_role_users(self, afl = None, role = None):
+		ls = []
+		for key in self.roles.keys():
+			if afl in (None, key[0]) and role in (None, key[1]):
+				ls.extend(self.get_indexed(self.roles, key))
+		return ls
+
+	count_here = lambda self: sum([len(nicks) for nicks in self.roles.values()])
+
+	@staticmethod
+	def index(index, key, nick, add = True):
+		if add:
+			index.setdefault(key, set()).add(nick)
+		else:
+			nicks = index.get(key)
+			if nicks is not None:
+				nicks.discard(nick)
+				if not nicks:
+					index.pop(key, None)
+
+	def index_user(self, nick, sUser, add = True):
+		if sUser.source:
+			self.index(self.sources, sUser.source, nick, add)
+			self.index(self.servers, self.get_server(sUser.source), nick, add)
+		if sUser.ishere:
+			self.index(self.roles, sUser.role, nick, add)
+
+	def del_user(self, nick):
+		sUser = self.desc.pop(nick, None)
+		if sUser:
+			self.index_user(nick, sUser, False)
+		return sUser
+
 	def sorted_users(self):
 		for user in sorted(self.get_nicks()):
 			user = self.get_user(user)
@@ -662,26 +744,38 @@ class sConf(object):
 		access = Galist.get(source, None)
 		if not access and access != 0:
 			access = self.alist.get(source, None)
-		self.desc[nick] = sUser(nick, role, source, access)
-		call_efunctions("04eh", (self.name, nick, source, role, stanza, self.disp,))
+		self.del_user(nick)
+		self.desc[nick] = sUser_ = sUser(nick, role, source, access)
+		self.index_user(nick, sUser_)
+		call_efunctions("04eh", (self.name, nick, source, role, stanza, self.disp,), self.name)
 
 	def aroles_change(self, nick, role, stanza):
 		sUser = self.get_user(nick)
+		old_role = sUser.role
 		if sUser.aroles(role):
+			if sUser.ishere:
+				self.index(self.roles, old_role, nick, False)
+				self.index(self.roles, role, nick)
 			if not Galist.has_key(sUser.source):
 				if not self.alist.has_key(sUser.source):
 					sUser.calc_acc()
-			call_efunctions("07eh", (self.name, nick, role, self.disp,))
+			call_efunctions("07eh", (self.name, nick, role, self.disp,), self.name)
 		else:
-			call_efunctions("08eh", (self.name, nick, stanza, self.disp,))
+			call_efunctions("08eh", (self.name, nick, stanza, self.disp,), self.name)
 
 	def set_nick(self, old_nick, nick):
-		self.desc[nick] = self.desc.pop(old_nick)
-		self.desc[nick].nick = nick
-		call_efunctions("06eh", (self.name, old_nick, nick, self.disp,))
+		sUser = self.del_user(old_nick)
+		self.del_user(nick)
+		sUser.nick = nick
+		self.desc[nick] = sUser
+		self.index_user(nick, sUser)
+		call_efunctions("06eh", (self.name, old_nick, nick, self.disp,), self.name)
 
 	def sleaved(self, nick):
-		self.desc[nick].ishere = False
+		sUser = self.desc[nick]
+		if sUser.ishere:
+			sUser.ishere = False
+			self.index(self.roles, sUser.role, nick, False)
 
 	def composePres(self):
 		stanza = xmpp.Presence("%s/%s" % (self.name, self.nick))
@@ -692,6 +786,7 @@ class sConf(object):
 	def join(self):
 		for sUser in self.get_users():
 			sUser.ishere = False
+		self.roles.clear()
 		stanza = self.composePres()
 		self.sdate = time.time()
 		node = xmpp.Node("x")
@@ -750,21 +845,38 @@ class sConf(object):
 
 	def iq_sender(self, attr, data, afrls, role, reason = str(), handler = None):
 		stanza = xmpp.Iq(sBase[9], to = self.name)
-		stanza.setID("Bs-i%d" % Info["outiq"].plus())
+		stanza.setID(get_iq_id())
 		query = xmpp.Node(sBase[18])
 		query.setNamespace(xmpp.NS_MUC_ADMIN)
-		arole = query.addChild("item", {attr: data, afrls: role})
-		if reason:
-			arole.setTagData("reason", reason)
+		if not isinstance(data, (list, tuple, set)):
+			data = (data,)
+		for x in data:
+			arole = query.addChild("item", {attr: x, afrls: role})
+			if reason:
+				arole.setTagData("reason", reason)
 		stanza.addChild(node = query)
-		if not handler:
+		if len(data) > 1:
+			CallForResponse(self.disp, stanza, self.iq_fallback, {"items": (attr, data, afrls, role, reason, handler)})
+		elif not handler:
 			self.csend(stanza)
 		else:
-			handler, kdesc = handler
-			if not handler:
-				handler = handleResponse
-				kdesc = {"source": kdesc}
-			CallForResponse(self.disp, stanza, handler, kdesc)
+			CallForResponse(self.disp, stanza, *self.iq_handler(handler))
+
+	def iq_handler(self, handler):
+		handler, kdesc = handler
+		if not handler:
+			handler = handleResponse
+			kdesc = {"source": kdesc}
+		return (handler, kdesc)
+
+	def iq_fallback(self, disp, stanza, items):
+		attr, data, afrls, role, reason, handler = items
+		if not xmpp.isResultNode(stanza):
+			for x in data:
+				self.iq_sender(attr, x, afrls, role, reason, handler)
+		elif handler:
+			handler, kdesc = self.iq_handler(handler)
+			handler(disp, stanza, **kdesc)
 
 	def outcast(self, jid, reason = str(), handler = ()):
 		self.iq_sender(sBase[11], jid, aRoles[0], aRoles[1], reason, handler)
@@ -820,7 +932,9 @@ def delivery(body):
 			if not online(Disp):
 				raise SelfExc("disconnected!")
 		Info["omsg"].plus()
-		Clients[Disp].send(xmpp.Message(GodName, body, sBase[0]))
+		stanza = xmpp.Message(GodName, body, sBase[0])
+		if not Reactor.post(Clients[Disp], stanza):
+			Clients[Disp].send(stanza)
 	except IOError:
 		Print("\n\n%s" % (body), color1)
 	except SelfExc:
@@ -829,7 +943,7 @@ def delivery(body):
 		exc_info_()
 
 def Message(inst, body, disp = None):
-	body = object_encode(body)
+	body, delay = object_encode(body), 0
 	if inst in Chats:
 		stype = sBase[1]
 		if not disp:
@@ -849,15 +963,24 @@ def Message(inst, body, disp = None):
 			else:
 				disp = GenDisp
 		if len(body) > PrivLimit:
-			Number, all = itypes.Number(), str(len(body) / PrivLimit + 1)
-			while len(body) > PrivLimit:
-				Info["omsg"].plus()
-				Sender(disp, xmpp.Message(inst, "[%d/%s] %s[...]" % (Number.plus(), all, body[:PrivLimit].strip()), stype))
-				body = body[PrivLimit:].strip()
-				sleep(2)
-			body = "[%d/%s] %s" % (Number.plus(), all, body)
+			ls = filter(None, [body[x:(x + PrivLimit)].strip() for x in xrange(0, len(body), PrivLimit)])
+			if ls:
+				all, step = len(ls), (0 if Reactor.isRegistered(get_disp(disp)) else 2)
+				for Numb, body in enumerate(ls[:-1], 1):
+					Info["omsg"].plus()
+					stanza = xmpp.Message(inst, "[%d/%d] %s[...]" % (Numb, all, body), stype)
+					if delay:
+						ithr.schedule(delay, sThread, ("message-part", Sender, (disp, stanza)))
+					else:
+						Sender(disp, stanza)
+					delay += step
+				body = "[%d/%d] %s" % (all, all, ls[-1])
 	Info["omsg"].plus()
-	Sender(disp, xmpp.Message(inst, body.strip(), stype))
+	stanza = xmpp.Message(inst, body.strip(), stype)
+	if delay: # parts are sent by the pool, a blocking write must not hold up the scheduler
+		ithr.schedule(delay, sThread, ("message-part", Sender, (disp, stanza)))
+	else:
+		Sender(disp, stanza)
 
 def Answer(body, stype, source, disp = None):
 	if stype == sBase[0]:
@@ -869,17 +992,11 @@ def Answer(body, stype, source, disp = None):
 
 def checkFlood(disp):
 	disp = get_disp(disp)
-	if disp in Guard:
-		desc = Guard[disp]
-	else:
-		desc = Guard[disp] = []
-	desc.append(time.time())
-	if len(desc) > 3:
-		if desc[-1] - desc[0] < 9:
-			Guard[disp] = [desc.pop()]
-			xmpp_raise()
-		else:
-			desc.pop(0)
+	desc = Guard.get(disp)
+	if desc is None:
+		desc = Guard[disp] = itypes.RateWindow(4)
+	if desc.hit(4, 9):
+		xmpp_raise()
 
 def IdleClient():
 	cls = dict()
@@ -919,10 +1036,9 @@ def CallForResponse(disp, stanza, handler, kdesc = {}):
 		if disp in Clients:
 			ID = stanza.getID()
 			if not ID:
-				xmpp.dispatcher.ID += 1
-				ID = str(xmpp.dispatcher.ID)
+				ID = get_iq_id()
 				stanza.setID(ID)
-			Clients[disp].RespExp[ID] = (handler, kdesc)
+			Clients[disp].RespExp[ID] = (handler, kdesc) # before the stanza is queued, the answer may come first
 			Sender(disp, stanza)
 
 def exec_bsExp(instance, disp, iq, kdesc):
@@ -945,7 +1061,8 @@ def Sender(disp, stanza):
 			if disp not in Clients:
 				raise SelfExc("client '%s' not exists" % (disp))
 			disp = Clients[disp]
-		disp.send(stanza)
+		if not Reactor.post(disp, stanza): # written directly only while the client isn't served by the reactor (connecting, shutdown)
+			disp.send(stanza)
 	except IOError:
 		pass
 	except SelfExc as exc:
@@ -955,8 +1072,11 @@ def Sender(disp, stanza):
 
 sUnavailable = lambda disp, data: Sender(disp, xmpp.Presence(typ = sBase[4], status = data))
 
+CapsNode = xmpp.simplexml.FrozenNode("c", {"node": Caps, "ver": CapsVer})
+CapsNode.setNamespace(xmpp.NS_CAPS)
+
 def caps_add(node):
-	node.setTag("c", {"node": Caps, "ver": CapsVer}, xmpp.NS_CAPS)
+	node.addChild(node = CapsNode)
 	return node
 
 Yday = lambda: getattr(time.gmtime(), "tm_yday")
@@ -1096,6 +1216,7 @@ class Web(object):
 		self.headers[name] = header
 
 	def open(self, header = ()):
+		ithr.checkpoint()
 		dest = self.Two.Request(self.link, self.data)
 		if header:
 			self.add_header(*header)
@@ -1293,7 +1414,7 @@ def xmppPresenceCB(disp, stanza):
 				elif ecode in (eCodes[5], eCodes[12]):
 					Chat.IamHere = False
 					TimerName = ejoinTimerName(conf)
-					if TimerName not in ithr.getNames():
+					if not ithr.isScheduled(TimerName):
 						try:
 							composeTimer(360, ejoinTimer, TimerName, (conf,)).start()
 						except ithr.error:
@@ -1356,9 +1477,9 @@ def xmppPresenceCB(disp, stanza):
 				Status = (stanza.getReason() or stanza.getStatus())
 				if Chat.isHereTS(nick):
 					Chat.sleaved(nick)
-				call_efunctions("05eh", (conf, nick, Status, scode, disp,))
+				call_efunctions("05eh", (conf, nick, Status, scode, disp,), conf)
 		if conf in Chats:
-			call_efunctions("02eh", (stanza, disp,))
+			call_efunctions("02eh", (stanza, disp,), conf)
 
 # Iq Handler
 
@@ -1465,7 +1586,7 @@ def xmppMessageCB(disp, stanza):
 			Message(source, body)
 		xmpp_raise()
 	if subject:
-		call_efunctions("09eh", (inst, nick, subject, body, disp,))
+		call_efunctions("09eh", (inst, nick, subject, body, disp,), inst)
 	else:
 		temp, isToBs = body, (stype == sBase[0])
 		if stype != sBase[1]:
@@ -1499,7 +1620,7 @@ def xmppMessageCB(disp, stanza):
 			VarCache["idle"] = time.time()
 			Cmds[command].execute(stype, (source, inst, nick), temp, disp)
 		else:
-			call_efunctions("01eh", (stanza, isConf, stype, (source, inst, nick), body, isToBs, disp,))
+			call_efunctions("01eh", (stanza, isConf, stype, (source, inst, nick), body, isToBs, disp,), (inst if isConf else None))
 
 # Connecting & Dispatching
 
@@ -1558,11 +1679,11 @@ def connect_client(inst, attrs):
 
 def connectAndDispatch(disp):
 	if reverseDisp(disp, False):
+		Reactor.register(disp)
 		sleep(60)
 		for conf in Chats.itervalues():
 			if disp == conf.disp:
 				conf.join()
-		Dispatcher(disp)
 	else:
 		delivery(AnsBase[28] % (disp))
 
@@ -1572,7 +1693,8 @@ def connect_clients():
 		if not conn[0]:
 			if conn[1] and conn[1] == eCodes[2]:
 				continue
-			composeTimer(60, connectAndDispatch, "%s-%s" % (sBase[13], inst), (inst,)).start()
+			thrName = "%s-%s" % (sBase[13], inst)
+			ithr.schedule(60, startThr, (composeThr(connectAndDispatch, thrName, (inst,)),), thrName)
 
 def reverseDisp(disp, rejoin = True):
 	iters = itypes.Number()
@@ -1586,47 +1708,289 @@ def reverseDisp(disp, rejoin = True):
 		else:
 			sleep(60)
 
-def Dispatcher(disp):
-	disp = Clients[disp]
-	zero = itypes.Number()
-	while VarCache["alive"]:
+class DispReactor(object):
+
+	"""
+	Reads sockets of all the clients in one thread (epoll if available, select otherwise).
+	Outgoing stanzas are queued per client and written by the same thread.
+	A client is written only when its socket is writable, a write stalled for "timeout" seconds drops the connection.
+	"""
+
+	timeout = 4
+
+	def __init__(self):
+		self.lock = ithr.allocate_lock()
+		self.sending = ithr.allocate_lock()
+		self.fds = {}
+		self.zero = {}
+		self.outbox = {}
+		self.depths = {}
+		self.buckets = {}
+		self.rooms = OrderedDict()
+		self.queued = set()
+		self.stats = {"peak": 0, "stanzas": 0, "writes": 0}
+		self.poll = (select.epoll() if hasattr(select, "epoll") else None)
+		self.thread = None
+		self.ident = None
+		self.woken = False
+		self.pipe = (os.pipe() if os.name != "nt" else None)
+		if self.pipe:
+			self.fds[self.pipe[0]] = None
+			if self.poll:
+				self.poll.register(self.pipe[0], select.EPOLLIN)
+
+	def register(self, disp):
+		sock = Clients[disp].Connection._sock
+		sock.settimeout(self.timeout)
+		fd = sock.fileno()
+		with self.lock:
+			self.__unregister(disp)
+			self.fds[fd] = disp
+			self.zero[disp] = itypes.Number()
+			self.outbox[disp] = {}
+			self.depths[disp] = 0
+			self.buckets[disp] = itypes.TokenBucket(SendRate, SendRate)
+			if self.poll:
+				try:
+					self.poll.register(fd, select.EPOLLIN | select.EPOLLPRI)
+				except IOError:
+					self.poll.modify(fd, select.EPOLLIN | select.EPOLLPRI)
+
+	def unregister(self, disp):
+		with self.lock:
+			self.__unregister(disp)
+
+	def __unregister(self, disp):
+		for fd, name in self.fds.items():
+			if name == disp:
+				del self.fds[fd]
+				if self.poll:
+					try:
+						self.poll.unregister(fd)
+					except (IOError, ValueError):
+						pass
+		self.zero.pop(disp, None)
+		self.outbox.pop(disp, None)
+		self.depths.pop(disp, None)
+		self.buckets.pop(disp, None)
+		self.queued.discard(disp)
+
+	isRegistered = lambda self, disp: (disp in self.zero)
+
+	count = lambda self: len(self.zero)
+
+	depth = lambda self: sum(self.depths.values())
+
+	def post(self, client, stanza):
+		if not VarCache["alive"]:
+			return False
+		disp = get_disp(client)
+		if disp not in self.outbox:
+			return False
+		if isinstance(stanza, basestring):
+			dest, limited = None, False
+		else:
+			dest = stanza.getTo()
+			if dest:
+				dest = dest.getStripped().lower()
+			limited = (stanza.getName() != "presence")
+			stanza = client.prepare(stanza)[1]
+		data = xmpp.ustr(stanza).encode("utf-8")
+		with self.lock:
+			box = self.outbox.get(disp)
+			if box is None:
+				return False
+			box.setdefault(dest, deque()).append((data, limited))
+			self.queued.add(disp)
+			self.depths[disp] += 1
+			if self.depths[disp] > self.stats["peak"]:
+				self.stats["peak"] = self.depths[disp]
+		if self.pipe and not self.woken:
+			self.woken = True
+			os.write(self.pipe[1], "\0")
+		return True
+
+	def room(self, disp, dest):
+		key = (disp, dest)
+		bucket = self.rooms.pop(key, None)
+		if bucket is None:
+			bucket = itypes.TokenBucket(RoomRate, RoomBurst)
+			if len(self.rooms) >= 1024: # the least recently used destination is forgotten
+				self.rooms.popitem(False)
+		self.rooms[key] = bucket
+		return bucket
+
+	def pick(self, disp, limit):
+		chunks, delay = [], 1.0
+		box, bucket = self.outbox[disp], self.buckets[disp]
+		for dest, queue in box.items():
+			room = (self.room(disp, dest) if dest and limit else None)
+			while queue:
+				data, limited = queue[0]
+				if limit:
+					wait = bucket.delay(len(data))
+					if not wait and limited and room:
+						wait = room.delay()
+					if wait:
+						delay = min(delay, wait)
+						break
+					bucket.take(len(data))
+					if limited and room:
+						room.take()
+				chunks.append(queue.popleft()[0])
+			if not queue:
+				del box[dest]
+		if not box:
+			self.queued.discard(disp)
+		self.depths[disp] -= len(chunks)
+		return (chunks, delay)
+
+	def flush(self, limit = True):
+		delay = 1.0
+		with self.sending:
+			for disp in list(self.queued):
+				conn = getattr(Clients.get(disp), "Connection", None)
+				if not conn:
+					continue
+				if limit and not self.writable(conn):
+					delay = min(delay, 0.05)
+					continue
+				with self.lock:
+					if disp not in self.outbox:
+						continue
+					chunks, wait = self.pick(disp, limit)
+				delay = min(delay, wait)
+				if chunks:
+					data = "".join(chunks)
+					try:
+						conn.send(data)
+					except IOError:
+						self.reconnect(disp)
+						continue
+					except Exception:
+						collectDFail()
+					self.stats["stanzas"] += len(chunks)
+					self.stats["writes"] += 1
+					Info["bytes"].plus(len(data))
+		return delay
+
+	@staticmethod
+	def writable(conn):
+		try:
+			return bool(select.select((), (conn._sock,), (), 0)[1])
+		except (IOError, select.error):
+			return True
+
+	def wait(self, timeout):
+		try:
+			if self.poll:
+				ready = [fd for fd, event in self.poll.poll(timeout)]
+			elif self.fds:
+				ready = select.select(self.fds.keys(), (), (), timeout)[0]
+			else:
+				sleep(timeout)
+				ready = ()
+		except (IOError, select.error):
+			ready = ()
+		fds = self.fds
+		if self.pipe and self.pipe[0] in ready:
+			os.read(self.pipe[0], 4096)
+			self.woken = False
+		return [fds[fd] for fd in ready if fds.get(fd)]
+
+	def buffered(self): # TLS may keep decrypted data which is not seen by poll
+		ls = []
+		for disp in self.zero.keys():
+			conn = getattr(Clients.get(disp), "Connection", None)
+			if getattr(conn, "_sslObj", None) and conn._seen_data:
+				ls.append(disp)
+		return ls
+
+	def start(self):
+		self.thread = composeThr(self.run, "reactor")
+		self.thread.start()
+
+	isAlive = lambda self: bool(self.thread and self.thread.isAlive())
+
+	isReactor = lambda self: (ithr.get_ident() == self.ident)
+
+	def run(self):
+		self.ident = ithr.get_ident()
+		delay = 1.0
+		while VarCache["alive"]:
+			try:
+				buffered = self.buffered()
+				if buffered:
+					timeout = 0
+				elif self.queued:
+					timeout = (delay if self.pipe else min(delay, 0.05))
+				else:
+					timeout = 1
+				if Pool.isFull(): # handlers are behind, the data is left in the sockets
+					sleep(0.05)
+				else:
+					for disp in set(self.wait(timeout) + buffered):
+						self.process(disp)
+				if self.queued:
+					delay = self.flush()
+			except Exception:
+				collectDFail()
+
+	def process(self, disp):
+		zero = self.zero.get(disp)
+		if zero is None:
+			return None
 		try:
-			if not disp.iter():
+			if not Clients[disp].Process(0):
 				if zero.plus() >= 16:
 					raise IOError("disconnected!")
-		except KeyboardInterrupt:
-			break
-		except SystemExit:
-			break
 		except IOError:
-			disp = get_disp(disp)
-			if not reverseDisp(disp):
-				delivery(AnsBase[28] % (disp))
-				break
-			disp = Clients[disp]
-			zero = itypes.Number()
+			self.reconnect(disp)
 		except xmpp.Conflict:
-			delivery(AnsBase[29] % get_disp(disp))
-			break
+			self.unregister(disp)
+			delivery(AnsBase[29] % (disp))
 		except xmpp.SystemShutdown:
-			disp = get_disp(disp)
-			if not reverseDisp(disp):
-				delivery(AnsBase[28] % (disp))
-				break
-			disp = Clients[disp]
-			zero = itypes.Number()
+			self.reconnect(disp)
 		except xmpp.StreamError:
 			pass
 		except Exception:
 			collectDFail()
-			if Info["errors"].plus() >= len(Clients.keys())*8:
+			Info["errors"].plus()
+			if Info["errors"] >= len(Clients.keys())*8:
 				sys_exit("Dispatch Errors!")
 
+	def reconnect(self, disp):
+		self.unregister(disp)
+		composeThr(self.reverse, "%s-%s" % (sBase[13], disp), (disp,)).start()
+
+	def reverse(self, disp):
+		if reverseDisp(disp):
+			self.register(disp)
+		else:
+			delivery(AnsBase[28] % (disp))
+
+Reactor = DispReactor()
+
 # load_mark2 & exit
 
+def sample_counters():
+	for counter in Info.itervalues():
+		if isinstance(counter, itypes.Counter):
+			counter.sample()
+	ithr.schedule(1, sample_counters, name = "sample_counters")
+
+def reactor_keeper():
+	if VarCache["alive"]:
+		if not Reactor.isAlive():
+			Print("\n\nReactor thread has died, restarting it.", color2)
+			Reactor.start()
+		ithr.schedule(10, reactor_keeper, name = "reactor_keeper")
+
 def load_mark2():
 	Print("\n\n%s\n\n" % (FullName), color3)
 	check_copies()
+	Pool.start()
+	sample_counters()
 	load_expansions()
 	call_sfunctions("00si")
 	connect_clients()
@@ -1637,14 +2001,15 @@ def load_mark2():
 	Print("\n\n%s is ready to serve!\n\n" % (ProdName), color3)
 	call_sfunctions("02si")
 	for disp in Clients.keys():
-		thrName = "%s-%s" % (sBase[13], disp)
-		if thrName not in ithr.getNames():
-			composeThr(Dispatcher, thrName, (disp,)).start()
+		if not ithr.isNamed("%s-%s" % (sBase[13], disp)):
+			Reactor.register(disp)
+	Reactor.start()
+	reactor_keeper()
 	while VarCache["alive"]:
 		sleep(180)
-		threads = 0
-		for name in ithr.getNames():
-			if name.startswith(sBase[13]):
+		threads = Reactor.count() + ithr.countPrefix(sBase[13])
+		for name in ithr.getScheduled():
+			if ithr.getPrefix(name) == sBase[13]:
 				threads += 1
 		if not threads:
 			sys_exit("All of the clients now fallen!")
@@ -1653,14 +2018,18 @@ def load_mark2():
 		if MaxMemory and MaxMemory <= calculate():
 			sys_exit("Memory leak...")
 
-def sys_exit(exit_desclr = "Suicide!"):
+def shutdown(exit_desclr):
 	VarCache["alive"] = False
-	Print("\n\n%s" % (exit_desclr), color2)
+	Reactor.flush(False)
 	ithr.killAllThreads()
 	for disp in Clients.keys():
 		if online(disp):
 			sUnavailable(disp, exit_desclr)
 	call_sfunctions("03si")
+
+def sys_exit(exit_desclr = "Suicide!"):
+	Print("\n\n%s" % (exit_desclr), color2)
+	shutdown(exit_desclr)
 	Exit("\n\nReloading...\n\nPress Ctrl+C to exit", 0, 30)
 
 if __name__ == "__main__":
@@ -86,14 +86,13 @@ class expansion_temp(expansion):
 				del Galist[instance]
 			cat_file(self.AccessFile, str(Galist))
 			for conf in Chats.keys():
-				for sUser in Chats[conf].get_users():
-					if sUser.source and sUser.source == instance:
-						if access == None:
-							access = Chats[conf].alist.get(instance, None)
-						if access != None:
-							sUser.access = access
-						else:
-							sUser.calc_acc()
+				for sUser in Chats[conf].get_source_users(instance):
+					if access == None:
+						access = Chats[conf].alist.get(instance, None)
+					if access != None:
+						sUser.access = access
+					else:
+						sUser.calc_acc()
 
 		if body:
 			body = body.split(None, 1)
@@ -139,14 +138,13 @@ class expansion_temp(expansion):
 			else:
 				del Chats[conf].alist[instance]
 			cat_file(chat_file(conf, self.ChatAccessFile), str(Chats[conf].alist))
-			for sUser in Chats[conf].get_users():
-				if sUser.source and sUser.source == instance:
-					if access == None:
-						access = Galist.get(instance, None)
-					if access != None:
-						sUser.access = access
-					else:
-						sUser.calc_acc()
+			for sUser in Chats[conf].get_source_users(instance):
+				if access == None:
+					access = Galist.get(instance, None)
+				if access != None:
+					sUser.access = access
+				else:
+					sUser.calc_acc()
 
 		if Chats.has_key(source[1]):
 			if body:
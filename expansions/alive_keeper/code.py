@@ -18,17 +18,16 @@ class expansion_temp(expansion):
 
 		while VarCache["alive"]:
 			sleep(120)
-			thrIds = ithr.getNames()
 			for disp_str, disp in Clients.iteritems():
 				if not hasattr(disp, "aKeeper"):
 					disp.aKeeper = itypes.Number()
 				if disp.aKeeper > 2:
 					disp.aKeeper = itypes.Number()
 					thrName = "%s-%s" % (sBase[13], disp_str)
-					if thrName in thrIds:
-						for thr in ithr.enumerate():
-							if thrName == thr.getName():
-								thr.kill()
+					for thr in ithr.getByName(thrName):
+						thr.kill()
+					ithr.cancel(thrName)
+					Reactor.unregister(disp_str)
 					try:
 						composeThr(connectAndDispatch, thrName, (disp_str,)).start()
 					except ithr.error:
@@ -39,12 +38,11 @@ class expansion_temp(expansion):
 					disp.aKeeper.plus()
 					iq = xmpp.Iq(sBase[10], to = "%s/%s" % (disp_str, GenResource))
 					iq.addChild(sBase[16], namespace = xmpp.NS_PING)
-					iq.setID("Bs-i%d" % Info["outiq"].plus())
+					iq.setID(get_iq_id())
 					CallForResponse(disp_str, iq, alive_keeper_answer)
 					del iq
 				else:
 					raise ithr.ThrKill("exit")
-			del thrIds
 
 	def conf_alive_keeper(self):
 
@@ -58,7 +56,6 @@ class expansion_temp(expansion):
 
 		while VarCache["alive"]:
 			sleep(360)
-			thrIds = ithr.getNames()
 			for conf in Chats.itervalues():
 				if not (online(conf.disp) and conf.IamHere):
 					continue
@@ -67,7 +64,7 @@ class expansion_temp(expansion):
 				if conf.aKeeper > 2:
 					conf.aKeeper = itypes.Number()
 					TimerName = ejoinTimerName(conf.name)
-					if TimerName not in thrIds:
+					if not ithr.isScheduled(TimerName):
 						try:
 							composeTimer(180, ejoinTimer, TimerName, (conf.name,)).start()
 						except ithr.error:
@@ -78,19 +75,17 @@ class expansion_temp(expansion):
 					conf.aKeeper.plus()
 					iq = xmpp.Iq(sBase[10], to = "%s/%s" % (conf.name, conf.nick))
 					iq.addChild(sBase[18], namespace = xmpp.NS_PING)
-					iq.setID("Bs-i%d" % Info["outiq"].plus())
+					iq.setID(get_iq_id())
 					CallForResponse(conf.disp, iq, conf_alive_keeper_answer, {"conf": conf.name})
 					del iq
 				else:
 					raise ithr.ThrKill("exit")
-			del thrIds
 
 	def start_keepers(self):
 		Name1 = self.alive_keeper.__name__
 		Name2 = self.conf_alive_keeper.__name__
-		for thr in ithr.enumerate():
-			if thr.name.startswith((Name1, Name2)):
-				thr.kill()
+		for thr in (ithr.getByPrefix(Name1) + ithr.getByPrefix(Name2)):
+			thr.kill()
 		composeThr(self.alive_keeper, Name1).start()
 		composeThr(self.conf_alive_keeper, Name2).start()
 
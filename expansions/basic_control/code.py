@@ -74,7 +74,7 @@ class expansion_temp(expansion):
 						else:
 							answer = self.AnsBase[3] % (conf)
 							sleep(3.6)
-							if ejoinTimerName(conf) in ithr.getNames():
+							if ithr.isScheduled(ejoinTimerName(conf)):
 								answer += self.AnsBase[13]
 					else:
 						answer = self.AnsBase[15] % (conf)
@@ -119,7 +119,6 @@ class expansion_temp(expansion):
 					delivery(self.AnsBase[4] % (source[2], source_, conf))
 				info = self.AnsBase[9] % (source[2])
 				Message(conf, info, Chats[conf].disp)
-				sleep(2)
 				Chats[conf].full_leave(info)
 				if conf != source[1]:
 					answer = self.AnsBase[10] % (conf)
@@ -138,24 +137,21 @@ class expansion_temp(expansion):
 		if InstancesDesc.has_key(Name):
 			thrName = "%s-%s" % (sBase[13], Name)
 			if Clients.has_key(Name):
-				for thr in ithr.enumerate():
-					if thrName == thr.getName():
-						thr.kill()
+				for thr in ithr.getByName(thrName):
+					thr.kill()
+				ithr.cancel(thrName)
+				Reactor.unregister(Name)
 				if online(Name):
 					try:
 						Clients[Name].disconnect()
 					except IOError:
 						pass
 			if connect_client(Name, InstancesDesc[Name])[0]:
-				try:
-					startThr(composeThr(Dispatcher, thrName, (Name,)), -1)
-				except RuntimeError:
-					answer = self.AnsBase[16]
-				else:
-					for conf in Chats.itervalues():
-						if Name == conf.disp:
-							conf.join()
-					answer = AnsBase[4]
+				Reactor.register(Name)
+				for conf in Chats.itervalues():
+					if Name == conf.disp:
+						conf.join()
+				answer = AnsBase[4]
 			else:
 				answer = AnsBase[7]
 		else:
@@ -169,13 +165,7 @@ class expansion_temp(expansion):
 				exit_desclr += self.AnsBase[1] % (body)
 			for conf in Chats.itervalues():
 				Message(conf.name, exit_desclr, conf.disp)
-		sleep(6)
-		VarCache["alive"] = False
-		ithr.killAllThreads()
-		for disp in Clients.keys():
-			if online(disp):
-				sUnavailable(disp, exit_desclr)
-		call_sfunctions("03si")
+		shutdown(exit_desclr)
 		Exit("\n\nRestart command...", 0, 15)
 
 	def command_exit(self, stype, source, body, disp):
@@ -185,13 +175,7 @@ class expansion_temp(expansion):
 				exit_desclr += self.AnsBase[1] % (body)
 			for conf in Chats.itervalues():
 				Message(conf.name, exit_desclr, conf.disp)
-		sleep(6)
-		VarCache["alive"] = False
-		ithr.killAllThreads()
-		for disp in Clients.keys():
-			if online(disp):
-				sUnavailable(disp, exit_desclr)
-		call_sfunctions("03si")
+		shutdown(exit_desclr)
 		Exit("\n\nSysExit command...", 1, 15)
 
 	commands = (
@@ -25,8 +25,6 @@ class expansion_temp(expansion):
 					if conf not in Chats:
 						raise SelfExc("exit")
 					Sender(disp, zero); Info["omsg"].plus()
-					if (Numb != 23):
-						sleep(1.4)
 				if stype == sBase[1]:
 					Chats[conf].change_status(s1_backup, s2_backup)
 				ChatsAttrs[conf]["dirt"] = True
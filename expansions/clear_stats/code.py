@@ -12,21 +12,20 @@ class expansion_temp(expansion):
 
 	def join_clear(self, conf, nick, instance, role, stanza, disp):
 		if instance:
-			for obj in Chats[conf].get_users():
-				if obj.source == instance and not obj.ishere and obj.nick != nick:
-					if Chats[conf].isHere(obj.nick):
-						Chats[conf].desc.pop(obj.nick)
+			for obj in Chats[conf].get_source_users(instance):
+				if not obj.ishere and obj.nick != nick:
+					Chats[conf].del_user(obj.nick)
 
 	def exit_clear(self, conf, nick, sbody, scode, disp):
 		instance = get_source(conf, nick)
 		if instance:
 			delete = False
-			for obj in Chats[conf].get_users():
-				if obj.source == instance and obj.ishere:
+			for obj in Chats[conf].get_source_users(instance):
+				if obj.ishere:
 					delete = True
 					break
-			if delete and Chats[conf].isHere(nick):
-				Chats[conf].desc.pop(nick)
+			if delete:
+				Chats[conf].del_user(nick)
 
 	handlers = (
 		(join_clear, "04eh"),
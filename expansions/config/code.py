@@ -99,9 +99,10 @@ class expansion_temp(expansion):
 										ConDisp.remove_section(x)
 							if Clients.has_key(Name):
 								thrName = "%s-%s" % (sBase[13], Name)
-								for thr in ithr.enumerate():
-									if thrName == thr.getName():
-										thr.kill()
+								for thr in ithr.getByName(thrName):
+									thr.kill()
+								ithr.cancel(thrName)
+								Reactor.unregister(Name)
 							for conf in Chats.itervalues():
 								if conf.disp == Name:
 									if online(Name):
@@ -162,15 +163,11 @@ class expansion_temp(expansion):
 									Instance, desc = client_config(ConDisp, Name)
 									InstancesDesc[Instance] = desc
 									cat_file(ConDispFile, self.get_config(ConDisp))
-									try:
-										startThr(composeThr(Dispatcher, "%s-%s" % (sBase[13], Instance), (Instance,)), -1)
-									except RuntimeError:
-										answer = self.AnsBase[8]
-									else:
-										for conf in Chats.itervalues():
-											if Instance == conf.disp:
-												conf.join()
-										answer = AnsBase[4]
+									Reactor.register(Instance)
+									for conf in Chats.itervalues():
+										if Instance == conf.disp:
+											conf.join()
+									answer = AnsBase[4]
 								else:
 									answer = self.AnsBase[9]
 							else:
@@ -202,6 +199,24 @@ class expansion_temp(expansion):
 							answer = self.AnsBase[12] % (Name)
 					else:
 						answer = self.AnsBase[11] % (Name)
+				elif body in ("debug", "отладка".decode("utf-8")):
+					Name = (args.pop(0)).lower()
+					if Clients.has_key(Name):
+						Debug = Clients[Name]._DEBUG
+						if len(args) >= 2:
+							flag, state = (args.pop(0)).encode("utf-8"), (args.pop(0)).lower()
+							if state in ("on", "вкл".decode("utf-8")):
+								Debug.set_flag(flag, True)
+								answer = AnsBase[4]
+							elif state in ("off", "выкл".decode("utf-8")):
+								Debug.set_flag(flag, False)
+								answer = AnsBase[4]
+							else:
+								answer = AnsBase[2]
+						else:
+							answer = self.AnsBase[13] % (Name, ", ".join(Debug.active_get() or ["-"]))
+					else:
+						answer = self.AnsBase[11] % (Name)
 				else:
 					answer = AnsBase[2]
 			else:
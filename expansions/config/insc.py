@@ -14,7 +14,8 @@ if DefLANG in ("RU", "UA"):
 		"Не коннектится.", # 9
 		"Этот jid уже есть в списках.", # 10
 		"«%s» нет в списке клиентов.", # 11
-		"«%s» сейчас оффлайн." # 12
+		"«%s» сейчас оффлайн.", # 12
+		"Отладка «%s»: %s" # 13
 	)])
 else:
 	AnsBase_temp = (
@@ -30,5 +31,6 @@ else:
 		"No connection.", # 9
 		"This jid is already in the list.", # 10
 		"'%s' not in clients-list.", # 11
-		"'%s' is offline." # 12
+		"'%s' is offline.", # 12
+		"Debug flags of '%s': %s" # 13
 	)
\ No newline at end of file
@@ -196,9 +196,8 @@ class expansion_temp(expansion):
 
 	def start_cron(self):
 		Name = self.def_cron.__name__
-		for thr in ithr.enumerate():
-			if thr.name.startswith(Name):
-				thr.kill()
+		for thr in ithr.getByPrefix(Name):
+			thr.kill()
 		if initialize_file(self.CronFile, "({}, 0)"):
 			cdesc, ccnt = eval(get_file(self.CronFile))
 			Time = time.mktime(time.gmtime())
@@ -23,7 +23,7 @@ class expansion_temp(expansion):
 			instance, source_ = source[0], get_source(source[1], source[2])
 		iq = xmpp.Iq(sBase[10], to = instance)
 		iq.addChild(sBase[16], namespace = xmpp.NS_PING)
-		iq.setID("Bs-i%d" % Info["outiq"].plus())
+		iq.setID(get_iq_id())
 		CallForResponse(disp, iq, self.answer_ping, {"stype": stype, "source": source, "instance": instance, "source_": source_, "start": time.time()})
 
 	PingStats = {}
@@ -39,7 +39,7 @@ class expansion_temp(expansion):
 		else:
 			iq = xmpp.Iq(sBase[10], to = instance)
 			iq.addChild(sBase[18], namespace = xmpp.NS_VERSION)
-			iq.setID("Bs-i%d" % Info["outiq"].plus())
+			iq.setID(get_iq_id())
 			CallForResponse(disp, iq, self.answer_ping_ver, {"stype": stype, "source": source, "instance": instance, "source_": source_, "start": time.time()})
 
 	def answer_ping_ver(self, disp, stanza, stype, source, instance, source_, start):
@@ -92,7 +92,7 @@ class expansion_temp(expansion):
 			instance = source[0]
 		iq = xmpp.Iq(sBase[10], to = instance)
 		iq.addChild(sBase[17], namespace = xmpp.NS_URN_TIME)
-		iq.setID("Bs-i%d" % Info["outiq"].plus())
+		iq.setID(get_iq_id())
 		CallForResponse(disp, iq, self.answer_time0202, {"stype": stype, "source": source, "instance": instance})
 
 	compile_tzo = compile__("^([-\+]+?)(\d+?):(\d+?)$")
@@ -131,7 +131,7 @@ class expansion_temp(expansion):
 		else:
 			iq = xmpp.Iq(sBase[10], to = instance)
 			iq.addChild(sBase[18], namespace = xmpp.NS_TIME)
-			iq.setID("Bs-i%d" % Info["outiq"].plus())
+			iq.setID(get_iq_id())
 			CallForResponse(disp, iq, self.answer_time0090, {"stype": stype, "source": source})
 
 	def answer_time0090(self, disp, stanza, stype, source):
@@ -154,7 +154,7 @@ class expansion_temp(expansion):
 			instance = source[0]
 		iq = xmpp.Iq(sBase[10], to = instance)
 		iq.addChild(sBase[18], namespace = xmpp.NS_VERSION)
-		iq.setID("Bs-i%d" % Info["outiq"].plus())
+		iq.setID(get_iq_id())
 		CallForResponse(disp, iq, self.answer_version, {"stype": stype, "source": source})
 
 	def answer_version(self, disp, stanza, stype, source):
@@ -186,7 +186,7 @@ class expansion_temp(expansion):
 			instance = source[0]
 		iq = xmpp.Iq(sBase[10], to = instance)
 		iq.addChild("vCard", namespace = xmpp.NS_VCARD)
-		iq.setID("Bs-i%d" % Info["outiq"].plus())
+		iq.setID(get_iq_id())
 		CallForResponse(disp, iq, self.answer_vcard, {"stype": stype, "source": source})
 
 	VcardDesc = {
@@ -243,7 +243,7 @@ class expansion_temp(expansion):
 			server = disp._owner.Server
 		iq = xmpp.Iq(sBase[10], to = server)
 		iq.addChild(sBase[18], namespace = xmpp.NS_LAST)
-		iq.setID("Bs-i%d" % Info["outiq"].plus())
+		iq.setID(get_iq_id())
 		CallForResponse(disp, iq, self.answer_idle, {"stype": stype, "source": source, "instance": server, "typ": None})
 
 	def command_idle(self, stype, source, instance, disp):
@@ -257,7 +257,7 @@ class expansion_temp(expansion):
 			if not locals().has_key(sBase[6]):
 				iq = xmpp.Iq(sBase[10], to = instance)
 				iq.addChild(sBase[18], namespace = xmpp.NS_LAST)
-				iq.setID("Bs-i%d" % Info["outiq"].plus())
+				iq.setID(get_iq_id())
 				CallForResponse(disp, iq, self.answer_idle, {"stype": stype, "source": source, "instance": nick, "typ": True})
 		else:
 			answer = AnsBase[1]
@@ -299,7 +299,7 @@ class expansion_temp(expansion):
 							query.setNamespace(xmpp.NS_MUC_ADMIN)
 							query.addChild("item", {aRoles[0]: role})
 							iq.addChild(node = query)
-							iq.setID("Bs-i%d" % Info["outiq"].plus())
+							iq.setID(get_iq_id())
 							CallForResponse(disp, iq, self.answer_aflist_search, {"desc": desc, "role": role, "data": data})
 						for x in xrange(60):
 							sleep(0.2)
@@ -336,7 +336,7 @@ class expansion_temp(expansion):
 						query.setNamespace(xmpp.NS_MUC_ADMIN)
 						query.addChild("item", {aRoles[0]: body})
 						iq.addChild(node = query)
-						iq.setID("Bs-i%d" % Info["outiq"].plus())
+						iq.setID(get_iq_id())
 						CallForResponse(disp, iq, self.answer_aflist, {"stype": stype, "source": source, "Numb": Numb})
 					else:
 						answer = AnsBase[2]
@@ -394,14 +394,14 @@ class expansion_temp(expansion):
 			server = disp._owner.Server
 		iq = xmpp.Iq(sBase[10], to = server)
 		iq.addChild(sBase[18], namespace = xmpp.NS_STATS)
-		iq.setID("Bs-i%d" % Info["outiq"].plus())
+		iq.setID(get_iq_id())
 		CallForResponse(disp, iq, self.answer_server_stats, {"stype": stype, "source": source})
 
 	def answer_server_stats(self, disp, stanza, stype, source):
 		if xmpp.isResultNode(stanza):
 			iq = xmpp.Iq(sBase[10], to = stanza.getFrom())
 			iq.addChild(sBase[18], {}, stanza.getQueryChildren() or [], xmpp.NS_STATS)
-			iq.setID("Bs-i%d" % Info["outiq"].plus())
+			iq.setID(get_iq_id())
 			CallForResponse(disp, iq, self.answer_server_stats_get, {"stype": stype, "source": source})
 		else:
 			Answer(self.AnsBase[6], stype, source, disp)
@@ -448,7 +448,7 @@ class expansion_temp(expansion):
 					desc["body"] = body[len(server):].strip()
 			iq = xmpp.Iq(sBase[10], to = server)
 			iq.addChild(sBase[18], namespace = xmpp.NS_DISCO_ITEMS)
-			iq.setID("Bs-i%d" % Info["outiq"].plus())
+			iq.setID(get_iq_id())
 			CallForResponse(disp, iq, self.answer_disco, desc)
 		else:
 			Answer(AnsBase[1], stype, source, disp)
@@ -11,9 +11,9 @@ class expansion_temp(expansion):
 		expansion.__init__(self, name)
 
 	def command_online(self, stype, source, body, disp):
-		ls, thrIds = self.AnsBase[7], ithr.getNames()
+		ls = self.AnsBase[7]
 		for numb, disp_ in enumerate(sorted(InstancesDesc.keys()), 1):
-			alive = str("%s-%s" % (sBase[13], disp_) in thrIds)
+			alive = str(Reactor.isRegistered(disp_))
 			connect = online(disp_)
 			if not connect:
 				connect = None
@@ -29,10 +29,7 @@ class expansion_temp(expansion):
 			cName = conf_str.split("@")[0]
 			disp_ = (conf.disp if access else "***")
 			cPref = str(conf.cPref)
-			online = itypes.Number()
-			for nick in conf.get_users():
-				if nick.ishere:
-					online.plus()
+			online = conf.count_here()
 			ls.append("%d) %s/%s [%s] \"%s\" (%s) - %s" % (Numb.plus(), cName, conf.nick, disp_, cPref, online, ("%s/%s" % arole if arole else str(arole))))
 		if ls:
 			if stype == sBase[1]:
@@ -46,19 +43,13 @@ class expansion_temp(expansion):
 		if Chats.has_key(source[1]):
 			ls, Numb, access = self.AnsBase[8], itypes.Number(), enough_access(source[1], source[2], 4)
 			owners, admins, members, none = [], [], [], []
-			for nick in Chats[source[1]].sorted_users():
-				if nick.ishere:
-					data = "%s [%d]" % (nick.nick, get_access(source[1], nick.nick))
-					if access and nick.source:
-						data += " (%s)" % (nick.source)
-					if nick.role[0] == aRoles[5]:
-						owners.append(data)
-					elif nick.role[0] == aRoles[4]:
-						admins.append(data)
-					elif nick.role[0] == aRoles[3]:
-						members.append(data)
-					else:
-						none.append(data)
+			for afl, users in ((aRoles[5], owners), (aRoles[4], admins), (aRoles[3], members), (aRoles[2], none)):
+				for nick in sorted(Chats[source[1]].get_role_users(afl), key = lambda sUser: sUser.nick):
+					if nick.ishere:
+						data = "%s [%d]" % (nick.nick, get_access(source[1], nick.nick))
+						if access and nick.source:
+							data += " (%s)" % (nick.source)
+						users.append(data)
 			if owners:
 				ls += "\n\nOwners:"
 				for x in owners:
@@ -92,7 +83,7 @@ class expansion_temp(expansion):
 				date = Yday()
 				for nick in Chats[source[1]].sorted_users():
 					if not nick.ishere:
-						if nick.date[1] == date:
+						if time.gmtime(nick.date).tm_yday == date:
 							if nick.source:
 								ls.append("%d. %s (%s)" % (Number.plus(), nick.nick, nick.source))
 							else:
@@ -109,7 +100,7 @@ class expansion_temp(expansion):
 				Number = itypes.Number()
 				ls = []
 				for nick in Chats[source[1]].sorted_users():
-					ls.append("%d. %s\t\t%s" % (Number.plus(), nick.nick, nick.date[2]))
+					ls.append("%d. %s\t\t%s" % (Number.plus(), nick.nick, time.strftime("%d.%m.%Y (%H:%M:%S)", time.gmtime(nick.date))))
 				if stype == sBase[1]:
 					answer = AnsBase[11]
 				Message(source[0], self.AnsBase[2] % (Number, str.join(chr(10), ls)), disp)
@@ -167,8 +158,9 @@ class expansion_temp(expansion):
 		if body:
 			ls, Numb, access = [], itypes.Number(), enough_access(source[1], source[2], 7)
 			body = sub_desc(body.lower(), self.eqMap)
+			source_ = isSource(body)
 			for conf_str, conf in sorted(Chats.items()):
-				for user in conf.sorted_users():
+				for user in (conf.get_source_users(body) if source_ else conf.sorted_users()):
 					if user.ishere:
 						if body in sub_desc(user.nick.lower(), self.eqMap) or (user.source and body in sub_desc(user.source, self.eqMap)):
 							if user.source and access:
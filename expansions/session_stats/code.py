@@ -54,6 +54,10 @@ class expansion_temp(expansion):
 		answer += self.AnsBase[4] % (Info["cmd"])
 		answer += self.AnsBase[5] % (Info["prs"], Info["iq"])
 		answer += self.AnsBase[6] % (Info["omsg"], Info["outiq"])
+		rates = []
+		for name in ("msg", "prs", "iq", "cmd", "omsg"):
+			rates.extend((Info[name].rate(1), Info[name].rate(60) * 60))
+		answer += self.AnsBase[24] % tuple(rates)
 		Number = itypes.Number()
 		for conf in Chats.itervalues():
 			Number.plus(len(conf.get_nicks()))
@@ -61,6 +65,10 @@ class expansion_temp(expansion):
 		answer += self.AnsBase[10] % (len(VarCache["errors"]), Info["errors"])
 		answer += self.AnsBase[11] % (Info["cfw"])
 		answer += self.AnsBase[12] % (ithr.Counter, len(ithr.enumerate()))
+		stats = Pool.stats
+		answer += self.AnsBase[23] % (Pool.busy, Pool.workers, Pool.qsize(), stats["peak"], Pool.lanes(), stats["done"], stats["overflow"], stats["forced"], (stats["waited"] / stats["done"] if stats["done"] else 0.0))
+		stats = Reactor.stats
+		answer += self.AnsBase[25] % (Reactor.depth(), stats["peak"], stats["stanzas"], stats["writes"], Info["bytes"].rate(1) / 1024)
 		answer += self.AnsBase[13] % os.times()[0]
 		Number = calculate()
 		if Number:
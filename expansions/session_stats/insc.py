@@ -24,7 +24,10 @@ if DefLANG in ("RU", "UA"):
 		"\n[№][Команда][Использований][Юзеров]\n", # 19
 		"Невозможно отправить ошибку, смотри к крешлогах.", # 20
 		"Ошибки №%s не существует!", # 21
-		"Всего произошло %d ошибок." # 22
+		"Всего произошло %d ошибок.", # 22
+		"\n# Пул обработчиков: занято %d из %d, в очереди %d (пик %d, комнат %d), выполнено %s, сверх очереди %d (поставлено реактором %d), среднее ожидание %.3f сек.", # 23
+		"\n# Нагрузка (в секунду/в минуту): сообщения %.2f/%d, презенсы %.2f/%d, iq %.2f/%d, команды %.2f/%d, отправлено %.2f/%d", # 24
+		"\n# Очередь отправки: %d станз (пик %d), отправлено %s станз за %s записей, %.2f КиБ/сек" # 25
 	)])
 else:
 	AnsBase_temp = (
@@ -50,5 +53,8 @@ else:
 		"\n[#][Command][Used][Users]\n", # 19
 		"Unable to send error, look for crash logs.", # 20
 		"Exception #%s isn't exists!", # 21
-		"Total %d exceptions happened." # 22
+		"Total %d exceptions happened.", # 22
+		"\n# Handlers pool: %d of %d busy, %d queued (peak %d, %d rooms), %s done, %d overflowed (%d queued by the reactor), average wait %.3f sec.", # 23
+		"\n# Load (per second/per minute): messages %.2f/%d, presences %.2f/%d, iq %.2f/%d, commands %.2f/%d, sent %.2f/%d", # 24
+		"\n# Send queue: %d stanzas (peak %d), %s stanzas sent by %s writes, %.2f KiB/sec" # 25
 	)
\ No newline at end of file
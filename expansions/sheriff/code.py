@@ -21,10 +21,16 @@ class expansion_temp(expansion):
 
 	class Convict(object):
 
+		__slots__ = ("devoice", "prdates", "msdates", "offenses", "kicks", "verif", "vakey", "vnumb", "date")
+
+		Window = 10
+
 		def __init__(self):
+			self.date = time.time()
 			self.devoice = 0
-			self.prdates = [time.time()]
-			self.msdates = []
+			self.prdates = itypes.RateWindow(self.Window)
+			self.prdates.add()
+			self.msdates = itypes.RateWindow(self.Window)
 			self.offenses = 0
 			self.kicks = itypes.Number()
 			self.verif = False
@@ -37,7 +43,7 @@ class expansion_temp(expansion):
 			delattr(self, "vnumb")
 
 		def leaved(self):
-			self.msdates = []
+			self.msdates.clear()
 			self.vakey = ""
 
 		def setDevoice(self):
@@ -45,11 +51,77 @@ class expansion_temp(expansion):
 
 		getDevoice = lambda self: (time.time() - self.devoice)
 
-		def addPrTime(self):
-			self.prdates.append(time.time())
+		def sizeof(self):
+			size = sys.getsizeof(self)
+			for dates in (self.prdates, self.msdates):
+				size += sys.getsizeof(dates) + sys.getsizeof(dates.dates) + sys.getsizeof(dates.values)
+			return size
+
+	class Jail(object):
+
+		"""
+		Convicts of a room in order of the last access.
+		The least recently seen ones are evicted if the room is over the limit or they were idle for "ttl" seconds,
+		but only after they have left the room ("present" tells if the jid is still there).
+		Devoiced ones are kept for "ttl" anyway, so rejoining does not reset their devoice.
+		"""
+
+		def __init__(self, size, present, ttl = 86400):
+			self.size = size
+			self.present = present
+			self.ttl = ttl
+			self.desc = OrderedDict()
+			self.lock = ithr.allocate_lock()
+			self.evicted = itypes.Number()
+
+		def get(self, source_):
+			with self.lock:
+				convict = self.desc.pop(source_, None)
+				if convict:
+					convict.date = time.time()
+					self.desc[source_] = convict
+			return convict
+
+		def __setitem__(self, source_, convict):
+			with self.lock:
+				self.desc.pop(source_, None)
+				self.desc[source_] = convict
+				self.prune()
+
+		def pop(self, source_, default = None):
+			with self.lock:
+				return self.desc.pop(source_, default)
+
+		def resize(self, size):
+			with self.lock:
+				self.size = size
+				self.prune()
+
+		def prune(self):
+			date = time.time() - self.ttl
+			for x in xrange(len(self.desc)):
+				source_, convict = next(self.desc.iteritems())
+				if len(self.desc) <= self.size and convict.date > date:
+					break
+				del self.desc[source_]
+				if self.present(source_):
+					convict.date = time.time()
+					self.desc[source_] = convict
+				elif convict.devoice and convict.date > date:
+					self.desc[source_] = convict
+				else:
+					self.evicted.plus()
+
+		def sizeof(self):
+			with self.lock:
+				ls = self.desc.values()
+			return sys.getsizeof(self.desc) + sum([convict.sizeof() for convict in ls])
+
+		__delitem__ = lambda self, source_: self.pop(source_)
 
-		def addMsTime(self):
-			self.msdates.append(time.time())
+		__contains__ = lambda self, source_: (source_ in self.desc)
+
+		__len__ = lambda self: len(self.desc)
 
 	def command_order(self, stype, source, body, disp):
 
@@ -130,14 +202,36 @@ class expansion_temp(expansion):
 						answer = alt_change_cfg(source[1], "len", arg1, (512, 2049))
 					elif arg0 in ("prslen", "прзлен".decode("utf-8")):
 						answer = alt_change_cfg(source[1], "prlen", arg1, (128, 513))
+					elif arg0 in ("flood", "флуд".decode("utf-8")):
+						answer = alt_change_cfg(source[1], "flood", arg1, (2, 11))
+					elif arg0 in ("floodtime", "флудтайм".decode("utf-8")):
+						answer = alt_change_cfg(source[1], "ftime", arg1, (2, 61))
+					elif arg0 in ("prsflood", "презфлуд".decode("utf-8")):
+						answer = alt_change_cfg(source[1], "prflood", arg1, (2, 11))
+					elif arg0 in ("prstime", "презтайм".decode("utf-8")):
+						answer = alt_change_cfg(source[1], "prtime", arg1, (2, 61))
+					elif arg0 in ("wipe", "вайп".decode("utf-8")):
+						answer = alt_change_cfg(source[1], "wipe", arg1, (2, 11))
+					elif arg0 in ("wipetime", "вайптайм".decode("utf-8")):
+						answer = alt_change_cfg(source[1], "wtime", arg1, (5, 121))
+					elif arg0 in ("prison", "тюрьма".decode("utf-8")):
+						answer = alt_change_cfg(source[1], "prison", arg1, (64, 8193))
 					else:
 						answer = AnsBase[2]
 					if answer == AnsBase[4]:
+						self.Prison[source[1]].resize(ChatsAttrs[source[1]]["laws"]["prison"])
 						cat_file(chat_file(source[1], self.LawsFile), str(ChatsAttrs[source[1]]["laws"]))
 				elif arg0 in ("servers", "сервера".decode("utf-8")):
 					answer = "\nDefault:\n%s" % enumerated_list(sorted(self.GoodServers))
 					if ChatsAttrs[source[1]]["laws"]["list"]:
 						answer += "\n\nDefined:\n%s" % enumerated_list(sorted(ChatsAttrs[source[1]]["laws"]["list"]))
+				elif arg0 in ("stats", "статистика".decode("utf-8")):
+					stats = self.FilterStats[source[1]]
+					answer = self.AnsBase[37] % (stats["scans"], (stats["time"] * 1000 / stats["scans"] if stats["scans"] else 0.0))
+					for rule, name in (("tiser", "atiser"), ("obscene", "aobscene"), ("len", "msglen"), ("lower", "acaps"), ("prlen", "prslen")):
+						answer += "\n%s: %d" % (name, stats.get(rule, 0))
+					prison = self.Prison[source[1]]
+					answer += self.AnsBase[39] % (len(prison), prison.size, prison.sizeof() / 1024.0, prison.evicted._int())
 				else:
 					answer = AnsBase[2]
 			else:
@@ -176,6 +270,8 @@ class expansion_temp(expansion):
 					answer += self.AnsBase[25][:-1]
 				else:
 					answer += self.AnsBase[26][:-1]
+				laws = ChatsAttrs[source[1]]["laws"]
+				answer += self.AnsBase[38] % (laws["flood"], laws["ftime"], laws["prflood"], laws["prtime"], laws["wipe"], laws["wtime"])
 		else:
 			answer = AnsBase[0]
 		Answer(answer, stype, source, disp)
@@ -190,16 +286,52 @@ class expansion_temp(expansion):
 			access = 2
 		return (loy, access)
 
-	compile_link = compile__("(?:http[s]?|ftp|svn)://[^\s'\"<>]+", 64)
-	compile_chat = compile__("[^\s]+?@(?:conference|muc|conf|chat|group)\.[\w-]+?\.[\w-]+", 64)
-
-	def tiser_checker(self, body):
-		body = body.lower()
-		if self.compile_link.search(body) or self.compile_chat.search(body):
-			return True
-		return False
+	def words_pattern(pattern):
+		"""
+		Folds a plain alternation "(?:word|word...)" into a prefix tree, so regex tries every char once per position.
+		"""
+		if not (pattern.startswith("(?:") and pattern.endswith(")")):
+			return pattern
+		trie = {}
+		for word in pattern[3:-1].split("|"):
+			if not word or compile__(r"[.^$*+?{}\[\]()|]|\\[^s]").search(word):
+				return pattern
+			node = trie
+			for token in compile__(r"\\s|.", 16).findall(word):
+				node = node.setdefault(token, {})
+			node[None] = None
+
+		def dump(node):
+			if None in node: # shorter word is enough for search()
+				return ""
+			ls = [token + dump(node[token]) for token in sorted(node)]
+			if len(ls) == 1:
+				return ls[0]
+			return "(?:%s)" % "|".join(ls)
+
+		return dump(trie)
+
+	Rules = {
+		"tiser": "(?:http[s]?|ftp|svn)://[^\s'\"<>]+|[^\s]+?@(?:conference|muc|conf|chat|group)\.[\w-]+?\.[\w-]+",
+		"obscene": words_pattern(Obscene)
+	}
+
+	del words_pattern
+
+	MsgRules = ("tiser", "obscene", "len", "lower")
+	PrsRules = ("tiser", "obscene", "prlen")
+
+	Regexes, FilterStats = {}, {}
+
+	def get_regex(self, rules):
+		regex = self.Regexes.get(rules)
+		if not regex:
+			regex = self.Regexes[rules] = compile__("|".join(["(?P<%s>%s)" % (rule, self.Rules[rule]) for rule in rules]), 66)
+		return regex
 
 	def lower_checker(self, chat, body):
+		if sum(map(unicode.isupper, body)) <= 12: # nicks removal would only decrease it
+			return False
 		numb, body = 0, sub_desc(body, [chr(32), chr(10), chr(13), chr(9)] + Chats[chat].get_nicks()).strip()
 		for char in body:
 			if char.isupper():
@@ -208,9 +340,34 @@ class expansion_temp(expansion):
 			return True
 		return False
 
-	Obscene = compile__(Obscene, 66)
-
-	obscene_checker = lambda self, body: self.Obscene.search(chr(32) + body + chr(32))
+	def scan(self, chat, body, rules):
+		"""
+		Checks the text against the enabled laws of the room, returns the set of the broken ones.
+		All the regex laws are joined into one pattern, so clean text is scanned once.
+		"""
+		laws, stats = ChatsAttrs[chat]["laws"], self.FilterStats[chat]
+		start, hits = time.time(), set()
+		if not isinstance(body, unicode):
+			body = body.decode("utf-8")
+		for rule in ("len", "prlen"):
+			if rule in rules and laws[rule] and len(body) > laws[rule]:
+				hits.add(rule)
+		if "lower" in rules and laws["lower"] and self.lower_checker(chat, body):
+			hits.add("lower")
+		rules = tuple([rule for rule in rules if rule in self.Rules and laws[rule]])
+		if rules:
+			body = chr(32) + body + chr(32)
+			while rules:
+				match = self.get_regex(rules).search(body)
+				if not match:
+					break
+				hits.add(match.lastgroup)
+				rules = tuple([rule for rule in rules if rule != match.lastgroup])
+		stats["scans"] += 1
+		stats["time"] += (time.time() - start)
+		for rule in hits:
+			stats[rule] = stats.get(rule, 0) + 1
+		return hits
 
 	def check_nick(self, chat, nick):
 
@@ -233,9 +390,17 @@ class expansion_temp(expansion):
 			if ChatsAttrs[chat]["laws"]["space"]:
 				if len(nick) != len(nick.strip()):
 					self.special_kick(chat, nick, self.AnsBase[2])
-			if ChatsAttrs[chat]["laws"]["obscene"]:
-				if self.obscene_checker(nick):
-					self.special_kick(chat, nick, self.AnsBase[3])
+			if self.scan(chat, nick, ("obscene",)):
+				self.special_kick(chat, nick, self.AnsBase[3])
+
+	def check_status(self, chat, nick, status):
+		hits = self.scan(chat, status, self.PrsRules)
+		if "tiser" in hits:
+			self.special_kick(chat, nick, self.AnsBase[4])
+		if "obscene" in hits:
+			self.special_kick(chat, nick, self.AnsBase[8])
+		if "prlen" in hits:
+			self.special_kick(chat, nick, self.AnsBase[9])
 
 	def sheriff_set(self, stype, source, source_, access, loyalty, body, disp):
 		if access <= loyalty:
@@ -263,18 +428,17 @@ class expansion_temp(expansion):
 			if source_:
 				loyalty, access = self.sheriffs_loyalty(source[1]), get_access(source[1], source[2])
 				if access <= loyalty[0]:
+					hits = self.scan(source[1], body, (self.MsgRules if stype == sBase[1] else ("tiser",)))
 					prisoner = self.Prison[source[1]].get(source_)
 					if prisoner:
-						prisoner.addMsTime()
-						if ChatsAttrs[source[1]]["laws"]["tiser"]:
-							if self.tiser_checker(body):
-								if access <= loyalty[1]:
-									if prisoner:
-										prisoner.setDevoice()
-									self.special_kick(source[1], source[2], self.AnsBase[4])
-								else:
-									Answer(self.AnsBase[4], stype, source, disp)
-								raise ithr.ThrKill("exit")
+						prisoner.msdates.add()
+						if "tiser" in hits:
+							if access <= loyalty[1]:
+								prisoner.setDevoice()
+								self.special_kick(source[1], source[2], self.AnsBase[4])
+							else:
+								Answer(self.AnsBase[4], stype, source, disp)
+							raise ithr.ThrKill("exit")
 						if ChatsAttrs[source[1]]["laws"]["verif"]:
 							if access < 2 and prisoner.vakey and stype == sBase[0]:
 								if prisoner.vakey == body.lower():
@@ -287,38 +451,27 @@ class expansion_temp(expansion):
 								else:
 									Message(source[0], self.AnsBase[23], disp)
 								raise ithr.ThrKill("exit")
-						list = prisoner.msdates
-						if len(list) >= 4:
-							if (list[-1] - list[0]) <= 6:
-								prisoner.msdates = [list.pop()]
-								prisoner.setDevoice()
-								self.special_kick(source[1], source[2], self.AnsBase[15])
-							else:
-								prisoner.msdates.pop(0)
-						del list
+						if prisoner.msdates.check(ChatsAttrs[source[1]]["laws"]["flood"], ChatsAttrs[source[1]]["laws"]["ftime"]):
+							prisoner.setDevoice()
+							self.special_kick(source[1], source[2], self.AnsBase[15])
 					if stype == sBase[1]:
-						if ChatsAttrs[source[1]]["laws"]["obscene"]:
-							if self.obscene_checker(body):
-								self.sheriff_set(stype, source, source_, access, loyalty[1], self.AnsBase[5], disp)
-						if ChatsAttrs[source[1]]["laws"]["len"]:
-							if len(body) > ChatsAttrs[source[1]]["laws"]["len"]:
-								self.sheriff_set(stype, source, source_, access, loyalty[1], self.AnsBase[6], disp)
-						if ChatsAttrs[source[1]]["laws"]["lower"]:
-							if self.lower_checker(source[1], body):
-								self.sheriff_set(stype, source, source_, access, loyalty[1], self.AnsBase[7], disp)
+						if "obscene" in hits:
+							self.sheriff_set(stype, source, source_, access, loyalty[1], self.AnsBase[5], disp)
+						if "len" in hits:
+							self.sheriff_set(stype, source, source_, access, loyalty[1], self.AnsBase[6], disp)
+						if "lower" in hits:
+							self.sheriff_set(stype, source, source_, access, loyalty[1], self.AnsBase[7], disp)
 
 	def awipeClear(self, chat, list):
 		if chat in Chats:
 			self.Antiwipe[chat]["clear"] = []
-			for sUser in Chats[chat].get_users():
-				if sUser.source in list:
-					if not sUser.ishere:
-						if Chats[chat].isHere(sUser.nick):
-							del Chats[chat].desc[sUser.nick]
-						if sUser.source in self.Prison[chat]:
-							del self.Prison[chat][sUser.source]
+			list = set(list)
 			for source_ in list:
-				Chats[chat].none(source_); sleep(0.4)
+				for sUser in Chats[chat].get_source_users(source_):
+					if not sUser.ishere:
+						Chats[chat].del_user(sUser.nick)
+						self.Prison[chat].pop(source_, None)
+			Chats[chat].none(list)
 
 	def get_server(self, source, state = False):
 		at = chr(64)
@@ -341,46 +494,32 @@ class expansion_temp(expansion):
 			elif ChatsAttrs[chat]["laws"]["awipe"]:
 				Time = time.time()
 				if (Time - Chats[chat].sdate) >= 60:
-					difference = (Time - self.Antiwipe[chat]["ltime"])
-					if difference > 360 and self.Antiwipe[chat]["clear"]:
-						sThread(self.awipeClear.__name__, self.awipeClear, (chat, self.Antiwipe[chat]["clear"],))
-					if difference > 15:
-						self.Antiwipe[chat]["ltime"] = Time
-						self.Antiwipe[chat]["jids"] = [inst]
-					else:
-						self.Antiwipe[chat]["jids"].append(inst)
-						joined = self.Antiwipe[chat]["jids"]
-						Numb = len(joined)
-						if Numb >= 3:
-							self.Antiwipe[chat]["ltime"] = Time
-							jid = self.get_server(inst)
-							if jid == self.get_server(joined[Numb - 2]) and jid == self.get_server(joined[Numb - 3]):
-								if jid not in self.GoodServers__(chat):
-									ls = []
-									for sUser in Chats[chat].get_users():
-										if sUser.source and sUser.ishere:
-											if sUser.nick != BsNick and sUser.role[0] == aRoles[2]:
-												if jid == self.get_server(sUser.source):
-													if sUser.source in self.Prison[chat]:
-														if not self.Prison[chat][sUser.source].verif:
-															ls.append(sUser)
-									Chats[chat].outcast(jid, self.AnsBase[12] % (BsNick))
-									if ls:
-										for sUser in ls:
-											Chats[chat].kick(sUser.nick, self.AnsBase[12] % (BsNick))
-								else:
-									for sUser in Chats[chat].get_users():
-										if sUser.source and sUser.ishere:
-											if sUser.nick != BsNick and sUser.role[0] == aRoles[2]:
-												if jid == self.get_server(sUser.source):
-													if sUser.source in self.Prison[chat]:
-														if not self.Prison[chat][sUser.source].verif:
-															self.Antiwipe[chat]["clear"].append(sUser.source)
-															Chats[chat].outcast(sUser.source, self.AnsBase[12] % (BsNick))
-							else:
-								self.Antiwipe[chat]["clear"].append(inst)
-								Chats[chat].outcast(inst, self.AnsBase[12] % (BsNick))
-							raise ithr.ThrKill("exit")
+					desc, laws = self.Antiwipe[chat], ChatsAttrs[chat]["laws"]
+					if (Time - desc["ltime"]) > 360 and desc["clear"]:
+						sThread(self.awipeClear.__name__, self.awipeClear, (chat, desc["clear"],))
+					desc["ltime"] = Time
+					desc["joins"].add(inst)
+					if desc["joins"].burst(laws["wipe"], laws["wtime"]):
+						jid = self.get_server(inst)
+						if all([jid == self.get_server(x) for x in desc["joins"].last(laws["wipe"])]):
+							ls = []
+							for sUser in Chats[chat].get_server_users(jid):
+								if sUser.ishere and sUser.nick != BsNick and sUser.role[0] == aRoles[2]:
+									prisoner = self.Prison[chat].get(sUser.source)
+									if prisoner and not prisoner.verif:
+										ls.append(sUser)
+							if jid not in self.GoodServers__(chat):
+								Chats[chat].outcast(jid, self.AnsBase[12] % (BsNick))
+								if ls:
+									Chats[chat].kick([sUser.nick for sUser in ls], self.AnsBase[12] % (BsNick))
+							elif ls:
+								ls = set([sUser.source for sUser in ls])
+								desc["clear"].extend(ls)
+								Chats[chat].outcast(ls, self.AnsBase[12] % (BsNick))
+						else:
+							desc["clear"].append(inst)
+							Chats[chat].outcast(inst, self.AnsBase[12] % (BsNick))
+						raise ithr.ThrKill("exit")
 
 	Questions = []
 
@@ -390,7 +529,7 @@ class expansion_temp(expansion):
 			if access <= self.sheriffs_loyalty(chat)[1]:
 				prisoner = self.Prison[chat].get(source_)
 				if prisoner:
-					prisoner.addPrTime()
+					prisoner.prdates.add()
 					if prisoner.devoice:
 						eTime = prisoner.getDevoice()
 						if (eTime < ChatsAttrs[chat]["laws"]["dtime"]):
@@ -415,25 +554,11 @@ class expansion_temp(expansion):
 						prisoner.vakey = an
 						Message("%s/%s" % (chat, nick), self.AnsBase[18] % (qu), disp)
 						del qu, an
-				list = prisoner.prdates
-				if len(list) >= 4:
-					if (list[-1] - list[0]) <= 10:
-						prisoner.prdates = [list.pop()]
-						self.special_kick(chat, nick, self.AnsBase[13])
-					else:
-						prisoner.prdates.pop(0)
-				del list
+				if prisoner.prdates.check(ChatsAttrs[chat]["laws"]["prflood"], ChatsAttrs[chat]["laws"]["prtime"]):
+					self.special_kick(chat, nick, self.AnsBase[13])
 				status = stanza.getStatus()
 				if status:
-					if ChatsAttrs[chat]["laws"]["tiser"]:
-						if self.tiser_checker(status):
-							self.special_kick(chat, nick, self.AnsBase[4])
-					if ChatsAttrs[chat]["laws"]["obscene"]:
-						if self.obscene_checker(status):
-							self.special_kick(chat, nick, self.AnsBase[8])
-					if ChatsAttrs[chat]["laws"]["prlen"]:
-						if len(status) > ChatsAttrs[chat]["laws"]["prlen"]:
-							self.special_kick(chat, nick, self.AnsBase[9])
+					self.check_status(chat, nick, status)
 
 	def sheriff_05eh(self, chat, nick, sbody, scode, disp):
 		if nick != get_nick(chat):
@@ -456,16 +581,11 @@ class expansion_temp(expansion):
 			if getattr(sUser, "source", None):
 				prisoner = self.Prison[chat].get(sUser.source)
 				if prisoner:
-					prisoner.addPrTime()
+					prisoner.prdates.add()
 					self.check_wipe(chat, nick, sUser.role[0], sUser.source)
 					self.check_nick(chat, nick)
-					list = prisoner.prdates
-					if len(list) >= 4:
-						if (list[-1] - list[0]) <= 10:
-							prisoner.prdates = [list.pop()]
-							self.special_kick(chat, nick, self.AnsBase[13])
-						else:
-							prisoner.prdates.pop(0)
+					if prisoner.prdates.check(ChatsAttrs[chat]["laws"]["prflood"], ChatsAttrs[chat]["laws"]["prtime"]):
+						self.special_kick(chat, nick, self.AnsBase[13])
 
 	def sheriff_07eh(self, chat, nick, role, disp):
 		if nick != get_nick(chat):
@@ -484,39 +604,33 @@ class expansion_temp(expansion):
 			if source_:
 				prisoner = self.Prison[chat].get(source_)
 				if prisoner:
-					prisoner.addPrTime()
-					list = prisoner.prdates
-					if len(list) >= 4:
-						if (list[-1] - list[0]) <= 10:
-							prisoner.prdates = [list.pop()]
-							self.special_kick(chat, nick, self.AnsBase[13])
-						else:
-							prisoner.prdates.pop(0)
-					del list
+					if prisoner.prdates.hit(ChatsAttrs[chat]["laws"]["prflood"], ChatsAttrs[chat]["laws"]["prtime"]):
+						self.special_kick(chat, nick, self.AnsBase[13])
 					status = stanza.getStatus()
 					if status:
-						if ChatsAttrs[chat]["laws"]["tiser"]:
-							if self.tiser_checker(status):
-								self.special_kick(chat, nick, self.AnsBase[4])
-						if ChatsAttrs[chat]["laws"]["obscene"]:
-							if self.obscene_checker(status):
-								self.special_kick(chat, nick, self.AnsBase[8])
-						if ChatsAttrs[chat]["laws"]["prlen"]:
-							if len(status) > ChatsAttrs[chat]["laws"]["prlen"]:
-								self.special_kick(chat, nick, self.AnsBase[9])
+						self.check_status(chat, nick, status)
 
 	def sheriff_01si(self, chat):
-		self.Prison[chat] = {}
-		self.Antiwipe[chat] = {"ltime": 0, "jids": [], "clear": []}
+		self.Antiwipe[chat] = {"ltime": 0, "joins": itypes.RateWindow(self.Convict.Window), "clear": []}
+		self.FilterStats[chat] = {"scans": 0, "time": 0.0}
 		desc = ChatsAttrs.setdefault(chat, {})
-		desc["laws"] = {"awipe": True, "space": True, "verif": False, "tiser": True, "obscene": False, "lower": False, "sparta": False, "list": [], "dtime": 180, "loyalty": 1, "aban": 3, "prlen": 256, "lnick": 24, "len": 1024}
+		desc["laws"] = {"awipe": True, "space": True, "verif": False, "tiser": True, "obscene": False, "lower": False, "sparta": False, "list": [], "dtime": 180, "loyalty": 1, "aban": 3, "prlen": 256, "lnick": 24, "len": 1024, "flood": 4, "ftime": 6, "prflood": 4, "prtime": 10, "wipe": 3, "wtime": 15, "prison": 1024}
 		filename = chat_file(chat, self.LawsFile)
 		if initialize_file(filename, str(desc["laws"])):
-			desc["laws"] = eval(get_file(filename))
+			desc["laws"].update(eval(get_file(filename)))
+		self.Prison[chat] = self.Jail(desc["laws"]["prison"], lambda source_: self.isPresent(chat, source_))
+
+	def isPresent(self, chat, source_):
+		if Chats.has_key(chat):
+			for sUser in Chats[chat].get_source_users(source_):
+				if sUser.ishere:
+					return True
+		return False
 
 	def sheriff_04si(self, chat):
 		del self.Prison[chat]
 		del self.Antiwipe[chat]
+		del self.FilterStats[chat]
 
 	commands = ((command_order, "order", 6,),)
 
@@ -47,7 +47,10 @@ if DefLANG in ("RU", "UA"):
 		"", # 33
 		"Сервер в белом списке.", # 34
 		"Сервера нет в дополнительном белом списке.", # 35
-		"Это не сервер." # 36
+		"Это не сервер.", # 36
+		"\nПроверено текстов: %d, в среднем %.3f мс.\nНарушения:", # 37
+		"\nФлуд: %d сообщений за %d сек.\nПрезенс-флуд: %d презенсов за %d сек.\nВайп: %d входов за %d сек.", # 38
+		"\nПодозреваемых: %d из %d (%.1f КиБ), вытеснено: %d" # 39
 	)])
 
 	Obscene = "(?:бляд|\sблят|\sбля\s|\sблять\s|\sплять\s|хуй|\sибал|\sебал|\sхуи|хуител|хуя|\sхую|\sхуе|\sахуе|\sохуе|хуев|хер|\sпох\s|\sнах\s|писд|пизд|рizd|\sпздц\s|\sеб|\sепана\s|\sепать\s|\sипать\s|\sвыепать\s|\sибаш|\sуеб|проеб|праеб|приеб|съеб|взъеб|взьеб|въеб|вьеб|выебан|перееб|недоеб|долбоеб|долбаеб|\sниибац|\sнеебац|\sнеебат|\sниибат|\sпидар|\sрidаr|\sпидар|\sпидор|педор|пидор|пидарас|пидараз|\sпедар|педри|пидри|\sзаеп|\sзаип|\sзаеб|ебучий|ебучка\s|епучий|епучка\s|\sзаиба|заебан|заебис|\sвыеб|выебан|\sпоеб|\sнаеб|\sнаеб|сьеб|взьеб|вьеб|\sгандон|\sгондон|пахуи|похуис|\sманда\s|мандав|залупа|\sзалупог)".decode("utf-8")
@@ -98,7 +101,10 @@ else:
 		"", # 33
 		"Server already in the white list.", # 34
 		"Server not in extra white list.", # 35
-		"This is not a server." # 36
+		"This is not a server.", # 36
+		"\nTexts checked: %d, %.3f ms on average.\nViolations:", # 37
+		"\nFlood: %d messages in %d seconds\nPresence flood: %d presences in %d seconds\nWipe: %d joins in %d seconds", # 38
+		"\nSuspects: %d of %d (%.1f KiB), evicted: %d" # 39
 	)
 
 	Obscene = "(?:\sfuck\s|\sshit\s|\sbitch\s|\sfaggot\s|\scock\s|\scunt\s)"
\ No newline at end of file
@@ -13,12 +13,83 @@ class expansion_temp(expansion):
 
 	TalkersFile = "talkers.db"
 
-	TalkersDesc = {}
+	GlobalFile = dynamic % (TalkersFile)
+
+	FlushPeriod = 30
+
+	Migrations = (
+		("create table if not exists talkers (jid text, lastnick text, msgs integer, words integer)",),
+		(
+			"create table talkers_ (jid text primary key, lastnick text, msgs integer default 0, words integer default 0)",
+			"insert into talkers_ select jid, lastnick, sum(msgs), sum(words) from talkers group by jid",
+			"drop table talkers",
+			"alter table talkers_ rename to talkers",
+			"create index talkers_msgs on talkers (msgs)"
+		),
+		(
+			"create table talkers_ (room text, jid text, lastnick text, msgs integer default 0, words integer default 0, primary key (room, jid))",
+			"insert into talkers_ select :room, jid, lastnick, msgs, words from talkers",
+			"drop table talkers",
+			"alter table talkers_ rename to talkers",
+			"create index talkers_msgs on talkers (room, msgs)",
+			"create index talkers_jid on talkers (jid)"
+		)
+	)
+
+	if itypes.Upsert:
+		AddTalker = "insert into talkers values (?,?,?,?,?) on conflict (room, jid) do update set lastnick=excluded.lastnick, msgs=msgs+excluded.msgs, words=words+excluded.words"
+	else:
+		AddTalker = None
+
+	Pending, PendingLock = dict(), ithr.allocate_lock()
+
+	def db(self, conf):
+		if GlobalStats:
+			return database(self.GlobalFile)
+		return database(cefile(chat_file(conf, self.TalkersFile)))
+
+	def select(self, sql, args, confs):
+		if GlobalStats and len(confs) > 1:
+			with self.db(None) as db:
+				db(sql % ("room in (%s)" % ", ".join(["?"]*len(confs))), tuple(confs) + args)
+				return db.fetchall()
+		ls = []
+		for conf in confs:
+			with self.db(conf) as db:
+				db(sql % ("room=?"), (conf,) + args)
+				ls.extend(db.fetchall())
+		return ls
+
+	def get_talkers(self, confs, limit = 256, key = None):
+		if len(confs) == 1 or GlobalStats:
+			count = limit
+		else: # rooms are merged by jid below, so every room gives its whole top
+			count = 256
+		if key:
+			sql, args = "%s and (jid like ? or lastnick like ?)", (key, key, count)
+		else:
+			sql, args = "%s", (count,)
+		if GlobalStats and len(confs) > 1:
+			sql = "select jid, lastnick, sum(msgs), sum(words) from talkers where " + sql + " group by jid order by sum(msgs) desc limit ?"
+		else: # a room has one row per jid, so talkers_msgs (room, msgs) gives the order
+			sql = "select jid, lastnick, msgs, words from talkers where " + sql + " order by msgs desc limit ?"
+		ls = self.select(sql, args, confs)
+		desc = {}
+		for x in ls:
+			if desc.has_key(x[0]):
+				desc[x[0]][2] += x[2]
+				desc[x[0]][3] += x[3]
+			else:
+				desc[x[0]] = list(x)
+		return sorted(desc.values(), key = lambda x: (x[2], x[3]), reverse = True)[:limit]
 
-	db = lambda self, conf: database(cefile(chat_file(conf, self.TalkersFile)), self.TalkersDesc[conf])
+	def get_talker(self, source_, confs):
+		ls = self.select("select sum(msgs), sum(words) from talkers where %s and jid=?", (source_,), confs)
+		return (sum([(x[0] or 0) for x in ls]), sum([(x[1] or 0) for x in ls]))
 
 	def command_talkers(self, stype, source, body, disp):
 		if Chats.has_key(source[1]):
+			self.flush_talkers()
 			if body:
 				ls = body.split()
 				if len(ls) >= 2:
@@ -32,142 +103,53 @@ class expansion_temp(expansion):
 						else:
 							Number = 0
 						if a2 in ("local", "локальный".decode("utf-8")):
-							with self.db(source[1]) as db:
-								db("select * from talkers order by -msgs")
-								db_desc = db.fetchmany(Number if Number > 0 else 10)
+							confs, limit = [source[1]], (Number if Number > 0 else 10)
+						elif a2 in ("global", "глобальный".decode("utf-8")):
+							confs, limit = Chats.keys(), (Number if Number > 0 else 20)
+						else:
+							confs = None
+						if confs:
+							db_desc = self.get_talkers(confs, limit)
 							if db_desc:
 								answer, Numb = self.AnsBase[0], itypes.Number()
 								for x in db_desc:
 									answer += "\n%d. %s\t\t%d\t%d\t%s" % (Numb.plus(), x[1], x[2], x[3], str(round((float(x[3]) / x[2]), 1)))
 							else:
 								answer = self.AnsBase[1]
-						elif a2 in ("global", "глобальный".decode("utf-8")):
-							Glob_dbs = {}
-							for conf in Chats.keys():
-								with self.db(conf) as db:
-									db("select * from talkers order by -msgs")
-									db_desc = db.fetchmany(256)
-								for x in db_desc:
-									if Glob_dbs.has_key(x[0]):
-										Glob_dbs[x[0]][2] += x[2]
-										Glob_dbs[x[0]][3] += x[3]
-									else:
-										Glob_dbs[x[0]] = list(x)
-							if Glob_dbs:
-								Top_list, limit = [], (Number if Number > 0 else 20)
-								for x, y in Glob_dbs.items():
-									Top_list.append([y[2], y[3], y[1]])
-								del Glob_dbs
-								answer, Numb = self.AnsBase[0], itypes.Number()
-								Top_list.sort()
-								Top_list.reverse()
-								for x in Top_list:
-									answer += "\n%d. %s\t\t%d\t%d\t%s" % (Numb.plus(), x[2], x[0], x[1], str(round((float(x[1]) / x[0]), 1)))
-									if Numb >= limit:
-										break
-							else:
-								answer = self.AnsBase[1]
 						else:
 							answer = AnsBase[2]
-					elif a1 in ("global", "глобальный".decode("utf-8")):
+					elif a1 in ("global", "глобальный".decode("utf-8"), "local", "локальный".decode("utf-8")):
 						a2 = body[((body.lower()).find(a1) + len(a1)):].strip()
-
-						def get_talker_stats(source_):
-							x, y = 0, 0
-							for conf in Chats.keys():
-								with self.db(conf) as db:
-									db("select * from talkers where jid=?", (source_,))
-									db_desc = db.fetchone()
-								if db_desc:
-									x += db_desc[2]
-									y += db_desc[3]
-							if x:
-								answer = self.AnsBase[2] % (x, y, str(round((float(y) / x), 1)))
-							else:
-								answer = self.AnsBase[1]
-							return answer
-
+						if a1 in ("global", "глобальный".decode("utf-8")):
+							confs = Chats.keys()
+						else:
+							confs = [source[1]]
+						key = None
 						if a2 in ("mine", "мой".decode("utf-8")):
 							source_ = get_source(source[1], source[2])
-							if source_:
-								answer = get_talker_stats(source_)
-							else:
-								answer = self.AnsBase[1]
+						elif Chats[source[1]].isHere(a2):
+							source_ = get_source(source[1], a2)
 						else:
-							if Chats[source[1]].isHere(a2):
-								source_ = get_source(source[1], a2)
-							else:
-								source_ = (ls.pop(0)).lower()
-								if not isSource(source_):
-									source_ = None
-							if source_:
-								answer = get_talker_stats(source_)
-							else:
-								Glob_dbs = {}
-								for conf in Chats.keys():
-									with self.db(conf) as db:
-										db("select * from talkers where (jid like ? or lastnick like ?) order by -msgs", (a2, a2))
-										db_desc = db.fetchmany(10)
-									for x in db_desc:
-										if Glob_dbs.has_key(x[0]):
-											Glob_dbs[x[0]][2] += x[2]
-											Glob_dbs[x[0]][3] += x[3]
-										else:
-											Glob_dbs[x[0]] = x
-								if Glob_dbs:
-									Usr_list = []
-									for x, y in Glob_dbs.items():
-										Usr_list.append([y[2], y[3], y[1]])
-									del Glob_dbs
-									answer, Numb = self.AnsBase[0], itypes.Number()
-									Usr_list.sort()
-									Usr_list.reverse()
-									for x in Usr_list:
-										answer += "\n%d. %s\t\t%d\t%d\t%s" % (Numb.plus(), x[2], x[0], x[1], str(round((float(x[1]) / x[0]), 1)))
-										if Numb >= 10:
-											break
-									answer += self.AnsBase[3]
-								else:
-									answer = self.AnsBase[1]
-					elif a1 in ("local", "локальный".decode("utf-8")):
-						a2 = body[((body.lower()).find(a1) + len(a1)):].strip()
-
-						def get_talker_stats(source_, conf):
-							with self.db(conf) as db:
-								db("select * from talkers where jid=?", (source_,))
-								x = db.fetchone()
-							if x:
-								answer = self.AnsBase[2] % (x[2], x[3], str(round((float(x[3]) / x[2]), 1)))
+							source_ = (ls.pop(0)).lower()
+							if not isSource(source_):
+								source_, key = None, a2
+						if key:
+							db_desc = self.get_talkers(confs, 10, key)
+							if db_desc:
+								answer, Numb = self.AnsBase[0], itypes.Number()
+								for x in db_desc:
+									answer += "\n%d. %s\t\t%d\t%d\t%s" % (Numb.plus(), x[1], x[2], x[3], str(round((float(x[3]) / x[2]), 1)))
+								answer += self.AnsBase[3]
 							else:
 								answer = self.AnsBase[1]
-							return answer
-
-						if a2 in ("mine", "мой".decode("utf-8")):
-							source_ = get_source(source[1], source[2])
-							if source_:
-								answer = get_talker_stats(source_, source[1])
+						elif source_:
+							x, y = self.get_talker(source_, confs)
+							if x:
+								answer = self.AnsBase[2] % (x, y, str(round((float(y) / x), 1)))
 							else:
 								answer = self.AnsBase[1]
 						else:
-							if Chats[source[1]].isHere(a2):
-								source_ = get_source(source[1], a2)
-							else:
-								source_ = (ls.pop(0)).lower()
-								if not isSource(source_):
-									source_ = None
-							if source_:
-								answer = get_talker_stats(source_, source[1])
-							else:
-								with self.db(source[1]) as db:
-									db("select * from talkers where (jid like ? or lastnick like ?) order by -msgs", (a2, a2))
-									db_desc = db.fetchmany(10)
-								if db_desc:
-									answer, Numb = self.AnsBase[0], itypes.Number()
-									for x in db_desc:
-										answer += "\n%d. %s\t\t%d\t%d\t%s" % (Numb.plus(), x[1], x[2], x[3], str(round((float(x[3]) / x[2]), 1)))
-									answer += self.AnsBase[3]
-								else:
-									answer = self.AnsBase[1]
+							answer = self.AnsBase[1]
 					else:
 						answer = AnsBase[2]
 				else:
@@ -182,31 +164,77 @@ class expansion_temp(expansion):
 		if isConf and stype == sBase[1] and source[2]:
 			source_ = get_source(source[1], source[2])
 			if source_:
-				nick = source[2].strip()
-				with self.db(source[1]) as db:
-					db("select * from talkers where jid=?", (source_,))
-					db_desc = db.fetchone()
-					if db_desc:
-						db("update talkers set lastnick=?, msgs=?, words=? where jid=?", (nick, (db_desc[2] + 1), (db_desc[3] + len(body.split())), source_))
+				nick, words = source[2].strip(), len(body.split())
+				with self.PendingLock:
+					desc = self.Pending.setdefault(source[1], {})
+					if source_ in desc:
+						x = desc[source_]
+						x[0] = nick
+						x[1] += 1
+						x[2] += words
 					else:
-						db("insert into talkers values (?,?,?,?)", (source_, nick, 1, len(body.split())))
-					db.commit()
+						desc[source_] = [nick, 1, words]
+
+	def flush_talkers(self, conf = None):
+		with self.PendingLock:
+			if conf:
+				ls = [(conf, self.Pending.pop(conf, None))]
+			else:
+				ls = self.Pending.items()
+				self.Pending.clear()
+		for conf, desc in ls:
+			if desc:
+				try:
+					with self.db(conf) as db:
+						for source_, (nick, msgs, words) in desc.iteritems():
+							if self.AddTalker:
+								db(self.AddTalker, (conf, source_, nick, msgs, words))
+							else:
+								db("update talkers set lastnick=?, msgs=msgs+?, words=words+? where room=? and jid=?", (nick, msgs, words, conf, source_))
+								if not db.cursor.rowcount:
+									db("insert into talkers values (?,?,?,?,?)", (conf, source_, nick, msgs, words))
+				except Exception:
+					self.restore_talkers(conf, desc)
+					collectExc(self.flush_talkers)
+
+	def restore_talkers(self, conf, desc):
+		with self.PendingLock:
+			pending = self.Pending.setdefault(conf, {})
+			for source_, (nick, msgs, words) in desc.iteritems():
+				if source_ in pending:
+					x = pending[source_]
+					x[1] += msgs
+					x[2] += words
+				else:
+					pending[source_] = [nick, msgs, words]
+
+	def talkers_timer(self):
+		try:
+			sThread("talkers-flush", self.flush_talkers)
+		finally:
+			if VarCache["alive"] and expansions.get(self.name) is self:
+				ithr.schedule(self.FlushPeriod, self.talkers_timer, name = "talkers-flush")
 
 	def init_talkers_base(self, conf):
+		with self.db(conf) as db:
+			db.migrate(self.Migrations, {"room": conf})
 		filename = cefile(chat_file(conf, self.TalkersFile))
-		if not os.path.isfile(filename):
+		if not GlobalStats:
+			itypes.Connections.close(filename)
+		elif os.path.isfile(filename):
 			with database(filename) as db:
-				db("create table talkers (jid text, lastnick text, msgs integer, words integer)")
-				db.commit()
-		self.TalkersDesc[conf] = ithr.Semaphore()
-
-	def edit_talkers_desc(self, conf):
-		del self.TalkersDesc[conf]
+				db.migrate(self.Migrations, {"room": conf})
+			with self.db(conf) as db:
+				db.absorb(filename, "talkers")
+			itypes.Connections.close(filename)
+			os.rename(filename, "%s.imported" % (filename))
 
 	commands = ((command_talkers, "talkers", 2,),)
 
 	handlers = (
 		(init_talkers_base, "01si"),
-		(edit_talkers_desc, "04si"),
+		(talkers_timer, "02si"),
+		(flush_talkers, "03si"),
+		(flush_talkers, "04si"),
 		(calculate_talkers, "01eh")
 	)
@@ -13,9 +13,76 @@ class expansion_temp(expansion):
 
 	UstatsFile = "jstat.db"
 
-	UstatsDesc = {}
+	GlobalFile = dynamic % (UstatsFile)
+
+	FlushPeriod = 30
+
+	def split_nicks(db):
+		db("create table nicks (room text, jid text, nick text, primary key (room, jid, nick))")
+		db("select room, jid, nicks from stat")
+		for room, jid, nicks in db.fetchall():
+			for nick in set(nicks.split("-/-")):
+				if nick:
+					db("insert into nicks values (?,?,?)", (room, jid, nick))
+		db("create table stat_ (room text, jid text, arole text, joined text, joins integer default 0, seen text, leave text, primary key (room, jid))")
+		db("insert into stat_ select room, jid, arole, joined, joins, seen, leave from stat")
+		db("drop table stat")
+		db("alter table stat_ rename to stat")
+
+	def merge_jids(db):
+
+		def date(data):
+			try:
+				return time.strptime(data, "%d.%m.%Y (%H:%M:%S)")
+			except (TypeError, ValueError):
+				return ()
+
+		desc = {}
+		db("select jid, arole, joined, joins, seen, leave, nicks from stat")
+		for jid, arole, joined, joins, seen, leave, nicks in db.fetchall():
+			nicks = set((nicks or "").split("-/-"))
+			if jid in desc:
+				x = desc[jid]
+				if date(seen) > date(x[4]):
+					x[1], x[4], x[5] = arole, seen, leave
+				if date(joined) > date(x[2]):
+					x[2] = joined
+				x[3] += (joins or 0)
+				x[6] |= nicks
+			else:
+				desc[jid] = [jid, arole, joined, (joins or 0), seen, leave, nicks]
+		db("create table stat_ (jid text primary key, arole text, joined text, joins integer default 0, seen text, leave text, nicks text)")
+		for x in desc.itervalues():
+			x[6] = "-/-".join(sorted(nick for nick in x[6] if nick))
+			db("insert into stat_ values (?,?,?,?,?,?,?)", x)
+		db("drop table stat")
+		db("alter table stat_ rename to stat")
+
+	Migrations = (
+		("create table if not exists stat (jid text, arole text, joined text, joins integer, seen text, leave text, nicks text)",),
+		merge_jids,
+		(
+			"create table stat_ (room text, jid text, arole text, joined text, joins integer default 0, seen text, leave text, nicks text, primary key (room, jid))",
+			"insert into stat_ select :room, jid, arole, joined, joins, seen, leave, nicks from stat",
+			"drop table stat",
+			"alter table stat_ rename to stat"
+		),
+		split_nicks
+	)
+
+	del merge_jids, split_nicks
+
+	if itypes.Upsert:
+		AddUser = "insert into stat values (?,?,?,?,?,'','') on conflict (room, jid) do update set joined=excluded.joined, joins=joins+excluded.joins"
+	else:
+		AddUser = None
 
-	db = lambda self, conf: database(cefile(chat_file(conf, self.UstatsFile)), self.UstatsDesc[conf])
+	Pending, PendingLock = dict(), ithr.allocate_lock()
+
+	def db(self, conf):
+		if GlobalStats:
+			return database(self.GlobalFile)
+		return database(cefile(chat_file(conf, self.UstatsFile)))
 
 	def command_user_stats(self, stype, source, body, disp):
 		if Chats.has_key(source[1]):
@@ -23,14 +90,17 @@ class expansion_temp(expansion):
 				body = get_source(source[1], source[2])
 			elif Chats[source[1]].isHere(body):
 				body = get_source(source[1], body)
+			self.flush_stat(source[1])
 			with self.db(source[1]) as db:
-				db("select * from stat where jid=?", (body,))
+				db("select jid, arole, joined, joins, seen, leave from stat where room=? and jid=?", (source[1], body))
 				db_desc = db.fetchone()
+				db("select nick from nicks where room=? and jid=?", (source[1], body))
+				nicks = [nick for (nick,) in db.fetchall()]
 			if db_desc:
 				answer = self.AnsBase[0] % (db_desc[3], db_desc[2], db_desc[1])
 				if db_desc[3] >= 2 and db_desc[4]:
 					answer += self.AnsBase[1] % (db_desc[4], db_desc[5])
-				answer += self.AnsBase[2] % (", ".join(sorted(db_desc[6].split("-/-"))))
+				answer += self.AnsBase[2] % (", ".join(sorted(nicks)))
 			else:
 				answer = self.AnsBase[3]
 		else:
@@ -42,7 +112,7 @@ class expansion_temp(expansion):
 			if not nick:
 				nick = source[2]
 			if Chats[source[1]].isHereTS(nick):
-				jtc = Time2Text(time.time() - Chats[source[1]].get_user(nick).date[0])
+				jtc = Time2Text(time.time() - Chats[source[1]].get_user(nick).date)
 				if nick != source[2]:
 					answer = self.AnsBase[4] % (nick, jtc)
 				else:
@@ -53,23 +123,21 @@ class expansion_temp(expansion):
 			answer = AnsBase[0]
 		Answer(answer, stype, source, disp)
 
+	def get_pending(self, conf, source_):
+		desc = self.Pending.setdefault(conf, {})
+		if source_ not in desc:
+			desc[source_] = {"arole": None, "joined": None, "joins": 0, "seen": None, "nicks": set()}
+		return desc[source_]
+
 	def calc_stat_04eh(self, conf, nick, instance, role, stanza, disp):
 		if instance and nick != get_nick(conf):
 			date = strfTime(local = False)
-			with self.db(conf) as db:
-				db("select * from stat where jid=?", (instance,))
-				db_desc = db.fetchone()
-				if db_desc:
-					db("update stat set joined=?, joins=? where jid=?", (date, (db_desc[3] + 1), instance))
-					if nick not in db_desc[6].split("-/-"):
-						db("update stat set nicks=? where jid=?", ("%s-/-%s" % (db_desc[6], nick), instance))
-					arole = "%s/%s" % (role)
-					if db_desc[1] != arole:
-						db("update stat set arole=? where jid=?", (arole, instance))
-					db.commit()
-				else:
-					db("insert into stat values (?,?,?,?,?,?,?)", (instance, "%s/%s" % (role), date, 1, "", "", nick))
-					db.commit()
+			with self.PendingLock:
+				desc = self.get_pending(conf, instance)
+				desc["arole"] = "%s/%s" % (role)
+				desc["joined"] = date
+				desc["joins"] += 1
+				desc["nicks"].add(nick)
 
 	def calc_stat_05eh(self, conf, nick, sbody, scode, disp):
 		if nick != get_nick(conf):
@@ -80,47 +148,83 @@ class expansion_temp(expansion):
 				elif scode == sCodes[2]:
 					sbody = "kicked:(%s)" % (sbody)
 				date = strfTime(local = False)
-				with self.db(conf) as db:
-					db("select * from stat where jid=?", (source_,))
-					db_desc = db.fetchone()
-					if db_desc:
-						db("update stat set seen=?, leave=? where jid=?", (date, unicode(sbody), source_))
-						db.commit()
+				with self.PendingLock:
+					self.get_pending(conf, source_)["seen"] = (date, unicode(sbody))
 
 	def calc_stat_06eh(self, conf, old_nick, nick, disp):
 		if nick != get_nick(conf):
 			source_ = get_source(conf, nick)
 			if source_:
-				with self.db(conf) as db:
-					db("select * from stat where jid=?", (source_,))
-					db_desc = db.fetchone()
-					if db_desc and nick not in db_desc[6].split("-/-"):
-						db("update stat set nicks=? where jid=?", ("%s-/-%s" % (db_desc[6], nick), source_))
-						db.commit()
+				with self.PendingLock:
+					self.get_pending(conf, source_)["nicks"].add(nick)
 
 	def calc_stat_07eh(self, conf, nick, role, disp):
 		if nick != get_nick(conf):
 			source_ = get_source(conf, nick)
 			if source_:
-				with self.db(conf) as db:
-					db("select * from stat where jid=?", (source_,))
-					db_desc = db.fetchone()
-					if db_desc:
-						arole = "%s/%s" % (role)
-						if db_desc[1] != arole:
-							db("update stat set arole=? where jid=?", (arole, source_))
-							db.commit()
+				with self.PendingLock:
+					self.get_pending(conf, source_)["arole"] = "%s/%s" % (role)
+
+	def flush_stat(self, conf = None):
+		with self.PendingLock:
+			if conf:
+				ls = [(conf, self.Pending.pop(conf, None))]
+			else:
+				ls = self.Pending.items()
+				self.Pending.clear()
+		for conf, users in ls:
+			if users:
+				try:
+					with self.db(conf) as db:
+						for source_, desc in users.iteritems():
+							if desc["joins"]:
+								if self.AddUser:
+									db(self.AddUser, (conf, source_, desc["arole"], desc["joined"], desc["joins"]))
+								else:
+									db("update stat set joined=?, joins=joins+? where room=? and jid=?", (desc["joined"], desc["joins"], conf, source_))
+									if not db.cursor.rowcount:
+										db("insert into stat values (?,?,?,?,?,?,?)", (conf, source_, desc["arole"], desc["joined"], desc["joins"], "", ""))
+							if desc["arole"]:
+								db("update stat set arole=? where room=? and jid=?", (desc["arole"], conf, source_))
+							if desc["seen"]:
+								db("update stat set seen=?, leave=? where room=? and jid=?", desc["seen"] + (conf, source_))
+							for nick in desc["nicks"]:
+								db("insert or ignore into nicks values (?,?,?)", (conf, source_, nick))
+				except Exception:
+					self.restore_stat(conf, users)
+					collectExc(self.flush_stat)
+
+	def restore_stat(self, conf, users):
+		with self.PendingLock:
+			for source_, old in users.iteritems():
+				desc = self.get_pending(conf, source_)
+				for key in ("arole", "joined", "seen"):
+					if not desc[key]:
+						desc[key] = old[key]
+				desc["joins"] += old["joins"]
+				desc["nicks"].update(old["nicks"])
+
+	def stat_timer(self):
+		try:
+			sThread("user_stats-flush", self.flush_stat)
+		finally:
+			if VarCache["alive"] and expansions.get(self.name) is self:
+				ithr.schedule(self.FlushPeriod, self.stat_timer, name = "user_stats-flush")
 
 	def init_stat_base(self, conf):
+		with self.db(conf) as db:
+			db.migrate(self.Migrations, {"room": conf})
 		filename = cefile(chat_file(conf, self.UstatsFile))
-		if not os.path.isfile(filename):
+		if not GlobalStats:
+			itypes.Connections.close(filename)
+		elif os.path.isfile(filename):
 			with database(filename) as db:
-				db("create table stat (jid text, arole text, joined text, joins integer, seen text, leave text, nicks text)")
-				db.commit()
-		self.UstatsDesc[conf] = ithr.Semaphore()
-
-	def edit_stat_desc(self, conf):
-		del self.UstatsDesc[conf]
+				db.migrate(self.Migrations, {"room": conf})
+			with self.db(conf) as db:
+				db.absorb(filename, "stat")
+				db.absorb(filename, "nicks")
+			itypes.Connections.close(filename)
+			os.rename(filename, "%s.imported" % (filename))
 
 	commands = (
 		(command_user_stats, "userstat", 2,),
@@ -129,7 +233,9 @@ class expansion_temp(expansion):
 
 	handlers = (
 		(init_stat_base, "01si"),
-		(edit_stat_desc, "04si"),
+		(stat_timer, "02si"),
+		(flush_stat, "03si"),
+		(flush_stat, "04si"),
 		(calc_stat_04eh, "04eh"),
 		(calc_stat_05eh, "05eh"),
 		(calc_stat_06eh, "06eh"),
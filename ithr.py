@@ -22,12 +22,25 @@ get_ident = thread.get_ident
 allocate_lock = thread.allocate_lock
 stack_size = thread.stack_size
 error = thread.error
+local = thread._local
 
 del thread
 
+import os
 import time
+import errno
 import warnings
 
+from select import select, error as select_error
+
+try:
+	from ctypes import pythonapi, py_object, c_long
+except ImportError:
+	pythonapi = None
+
+from collections import deque
+from heapq import heappush, heappop
+
 __all__ = [
 	"BoundedSemaphore",
 	"Condition",
@@ -36,19 +49,38 @@ __all__ = [
 	"Number",
 	"PickSomeNonDaemonThread",
 	"RLock",
+	"Scheduler",
+	"ScheduledTimer",
 	"Semaphore",
 	"Thread",
 	"Timer",
 	"UnBoundedSemaphore",
+	"Worker",
+	"WorkerPool",
 	"allocate_lock",
+	"async_raise",
+	"cancel",
+	"checkpoint",
+	"countPrefix",
 	"currentThread",
 	"enumerate",
 	"error",
 	"get_exc",
 	"get_ident",
+	"getByName",
+	"getByPrefix",
 	"getNames",
+	"getPrefix",
+	"getScheduled",
+	"getScheduler",
+	"getTimer",
+	"isNamed",
+	"isScheduled",
 	"killAllThreads",
+	"reschedule",
+	"schedule",
 	"sThread_Run",
+	"sleep",
 	"stack_size"
 ]
 
@@ -73,7 +105,7 @@ class RLock(object):
 
 	def acquire(self, blocking = 1):
 		me = get_ident()
-		if self.__owner is me:
+		if self.__owner == me:
 			self.__count += 1
 			return 1
 		rc = self.__block.acquire(blocking)
@@ -88,7 +120,7 @@ class RLock(object):
 		if self.__owner != get_ident():
 			raise RuntimeError("cannot release un-acquired lock")
 		self.__count -= 1
-		if not count:
+		if not self.__count:
 			self.__owner = None
 			self.__block.release()
 
@@ -110,7 +142,43 @@ class RLock(object):
 		return (count, owner)
 
 	def _is_owned(self):
-		return (self.__owner is get_ident())
+		return (self.__owner == get_ident())
+
+class PipeWaiter(object):
+
+	"""
+	Per-thread waiter for timed Condition.wait(), blocks in select() instead of polling.
+	"""
+
+	def __init__(self):
+		self.rfd, self.wfd = os.pipe()
+		self.fired = False
+
+	def release(self):
+		self.fired = True
+		os.write(self.wfd, "\0")
+
+	def wait(self, timeout):
+		endtime = (time.time() + timeout)
+		while True:
+			try:
+				return bool(select((self.rfd,), (), (), max(endtime - time.time(), 0))[0])
+			except select_error as exc:
+				if exc.args[0] != errno.EINTR:
+					raise
+
+	def clear(self):
+		if self.fired:
+			os.read(self.rfd, 1)
+			self.fired = False
+
+	def __del__(self):
+		os.close(self.rfd)
+		os.close(self.wfd)
+
+PipeWaiters = (os.name != "nt")
+
+Waiters = local()
 
 class Condition(object):
 
@@ -158,6 +226,8 @@ class Condition(object):
 	def wait(self, timeout = None):
 		if not self._is_owned():
 			raise RuntimeError("cannot wait on un-acquired lock")
+		if timeout is not None and PipeWaiters:
+			return self.__wait_pipe(timeout)
 		waiter = allocate_lock()
 		waiter.acquire()
 		self.__waiters.append(waiter)
@@ -185,6 +255,21 @@ class Condition(object):
 		finally:
 			self._acquire_restore(saved_state)
 
+	def __wait_pipe(self, timeout):
+		waiter = getattr(Waiters, "waiter", None)
+		if waiter is None:
+			waiter = Waiters.waiter = PipeWaiter()
+		self.__waiters.append(waiter)
+		saved_state = self._release_save()
+		try:
+			waiter.wait(timeout)
+		finally:
+			self._acquire_restore(saved_state)
+			try:
+				self.__waiters.remove(waiter)
+			except ValueError:
+				waiter.clear()
+
 	def notify(self, number = 1):
 		if not self._is_owned():
 			raise RuntimeError("cannot notify on un-acquired lock")
@@ -325,6 +410,34 @@ active_limbo_lock = allocate_lock()
 ActiveThreads = {}
 Thrlimbo = {}
 
+ThrNames = {}
+ThrPrefixes = {}
+
+getPrefix = lambda name: name.split("-", 1)[0]
+
+def _index(thr): # active_limbo_lock must be held
+	name = thr.name
+	ThrNames.setdefault(name, set()).add(thr)
+	ThrPrefixes.setdefault(getPrefix(name), set()).add(thr)
+
+def _unindex(thr):
+	name = thr.name
+	threads = ThrNames.get(name)
+	if not threads or thr not in threads:
+		return False
+	threads.discard(thr)
+	if not threads:
+		del ThrNames[name]
+	prefix = getPrefix(name)
+	threads = ThrPrefixes[prefix]
+	threads.discard(thr)
+	if not threads:
+		del ThrPrefixes[prefix]
+	return True
+
+scheduler_lock = allocate_lock()
+TimerScheduler = None
+
 class Thread(object):
 
 	__initialized = False
@@ -369,11 +482,13 @@ class Thread(object):
 			raise RuntimeError("threads can only be started once")
 		with active_limbo_lock:
 			Thrlimbo[self.__limbo_name] = self
+			_index(self)
 		try:
 			sThread_Run(self.__bootstrap, ())
 		except Exception:
 			with active_limbo_lock:
 				del Thrlimbo[self.__limbo_name]
+				_unindex(self)
 			raise
 		self.__started.wait()
 
@@ -426,6 +541,7 @@ class Thread(object):
 		finally:
 			with active_limbo_lock:
 				self.__stop()
+				_unindex(self)
 				try:
 					del ActiveThreads[get_ident()]
 				except Exception:
@@ -439,6 +555,7 @@ class Thread(object):
 
 	def __delete(self):
 		with active_limbo_lock:
+			_unindex(self)
 			try:
 				del ActiveThreads[get_ident()]
 			except KeyError:
@@ -475,7 +592,11 @@ class Thread(object):
 	@name.setter
 	def name(self, name):
 		assert self.__initialized, "Thread.__init__() not called"
-		self.__name = str(name)
+		with active_limbo_lock:
+			indexed = _unindex(self)
+			self.__name = str(name)
+			if indexed:
+				_index(self)
 
 	@property
 	def ident(self):
@@ -516,16 +637,26 @@ class ThrKill(SystemExit):
 
 class KThread(Thread): # by Connelly Barnes (connellybarnes@yahoo.com)
 
+	"""
+	Killable thread. Kill modes:
+		"trace" - sys.settrace() checks the flag on every line (slow, but reliable);
+		"async" - ThrKill is injected into the thread by the interpreter,
+			blocking calls are interrupted only in checkpoint() & sleep().
+	"""
+
 	def __init__(self, *args, **kwargs):
+		self.kill_mode = kwargs.pop("kill_mode", "trace")
 		Thread.__init__(self, None, *args, **kwargs)
 		self.killed = False
+		self.stopping = Event()
 		self._run_backup = self.run
 		self.run = self.__run
 		self._start_backup = self.start
 		self.start = self.__start
 
 	def __run(self):
-		sys.settrace(self.globaltrace)
+		if self.kill_mode == "trace":
+			sys.settrace(self.globaltrace)
 		try:
 			self._run_backup()
 		except ThrKill:
@@ -549,7 +680,33 @@ class KThread(Thread): # by Connelly Barnes (connellybarnes@yahoo.com)
 		return self.localtrace
 
 	def kill(self):
-		self.killed = True
+		if not self.killed:
+			self.killed = True
+			self.stopping.set()
+			if self.kill_mode == "async" and self.isAlive():
+				async_raise(self.ident)
+
+def async_raise(ident, exc = ThrKill):
+	if not pythonapi or ident is None:
+		return False
+	count = pythonapi.PyThreadState_SetAsyncExc(c_long(ident), py_object(exc))
+	if count > 1:
+		pythonapi.PyThreadState_SetAsyncExc(c_long(ident), None)
+		count = 0
+	return (count == 1)
+
+def checkpoint():
+	thr = ActiveThreads.get(get_ident())
+	if getattr(thr, "killed", False):
+		raise ThrKill("exit")
+
+def sleep(delay):
+	thr = ActiveThreads.get(get_ident())
+	if isinstance(thr, KThread):
+		thr.stopping.wait(delay)
+		checkpoint()
+	else:
+		time.sleep(delay)
 
 class Timer(Thread):
 
@@ -574,6 +731,287 @@ class Timer(Thread):
 			self.function(*self.args, **self.kwargs)
 		self.finished.set()
 
+class ScheduledTimer(object):
+
+	"""
+	Timer without a thread of its own, it is fired by the Scheduler.
+	"""
+
+	def __init__(self, interval, function, args = (), kwargs = {}, name = None):
+		self.interval = interval
+		self.function = function
+		self.args = args
+		self.kwargs = kwargs
+		self.name = str(name or _newname("Timer-%d"))
+		self.deadline = None
+		self.cancelled = False
+
+	def __repr__(self):
+		return "<%s(%s, %s)>" % (self.__class__.__name__, self.name, self.deadline)
+
+	def start(self):
+		getScheduler().add(self)
+
+	def cancel(self):
+		self.cancelled = True
+		if TimerScheduler:
+			TimerScheduler.remove(self)
+
+	def kill(self):
+		self.cancel()
+
+	def isAlive(self):
+		return not self.cancelled and getTimer(self.name) is self
+
+	def getName(self):
+		return self.name
+
+	def setName(self, name):
+		self.name = str(name)
+
+class Scheduler(Thread):
+
+	def __init__(self, name = "scheduler"):
+		Thread.__init__(self, name = name)
+		self.alive = True
+		self.__cond = Condition(allocate_lock())
+		self.__heap = []
+		self.__names = {}
+		self.__number = 0
+
+	def _set_daemon(self):
+		return True
+
+	def add(self, timer):
+		with self.__cond:
+			old = self.__names.get(timer.name)
+			if old is not None:
+				old.cancelled = True
+			self.__number += 1
+			timer.cancelled = False
+			timer.deadline = time.time() + timer.interval
+			self.__names[timer.name] = timer
+			heappush(self.__heap, (timer.deadline, self.__number, timer))
+			self.__cond.notify()
+
+	def remove(self, timer):
+		with self.__cond:
+			if self.__names.get(timer.name) is timer:
+				del self.__names[timer.name]
+
+	def get(self, name):
+		return self.__names.get(name)
+
+	def names(self):
+		with self.__cond:
+			return self.__names.keys()
+
+	def kill(self):
+		with self.__cond:
+			self.alive = False
+			for timer in self.__names.itervalues():
+				timer.cancelled = True
+			self.__names.clear()
+			del self.__heap[:]
+			self.__cond.notify()
+
+	def run(self):
+		Counter.plus()
+		while True:
+			with self.__cond:
+				while self.alive:
+					if not self.__heap:
+						self.__cond.wait()
+						continue
+					(deadline, number, timer) = self.__heap[0]
+					if timer.cancelled or timer.deadline != deadline:
+						heappop(self.__heap)
+						continue
+					delay = (deadline - time.time())
+					if delay > 0:
+						self.__cond.wait(delay)
+						continue
+					heappop(self.__heap)
+					if self.__names.get(timer.name) is timer:
+						del self.__names[timer.name]
+					break
+				else:
+					break
+			try:
+				timer.function(*timer.args, **timer.kwargs)
+			except SystemExit:
+				pass
+			except Exception:
+				try:
+					sys.stderr.write("Exception in timer %s:\n%s\n" % (timer.name, get_exc()))
+				except Exception:
+					pass
+
+def getScheduler():
+	global TimerScheduler
+	with scheduler_lock:
+		if not (TimerScheduler and TimerScheduler.alive):
+			TimerScheduler = Scheduler()
+			TimerScheduler.start()
+	return TimerScheduler
+
+def getTimer(name):
+	sched = TimerScheduler
+	if sched and sched.alive:
+		return sched.get(name)
+	return None
+
+def schedule(interval, function, args = (), name = None):
+	timer = ScheduledTimer(interval, function, args, name = name)
+	timer.start()
+	return timer
+
+def cancel(name):
+	timer = getTimer(name)
+	if timer:
+		timer.cancel()
+		return True
+	return False
+
+def reschedule(name, interval = None):
+	timer = getTimer(name)
+	if timer:
+		if interval is not None:
+			timer.interval = interval
+		timer.start()
+		return True
+	return False
+
+isScheduled = lambda name: (getTimer(name) is not None)
+
+def getScheduled():
+	sched = TimerScheduler
+	if sched and sched.alive:
+		return sched.names()
+	return []
+
+class Worker(Thread):
+
+	def __init__(self, pool, name):
+		Thread.__init__(self, name = name)
+		self.pool = pool
+
+	def run(self):
+		Counter.plus()
+		self.pool._loop()
+
+	def kill(self):
+		self.pool.stop()
+
+class WorkerPool(object):
+
+	def __init__(self, workers = 8, limit = 1024, name = "worker"):
+		self.workers = max(workers, 1)
+		self.limit = limit
+		self.name = name
+		self.alive = False
+		self.busy = 0
+		self.stats = {"put": 0, "done": 0, "overflow": 0, "forced": 0, "peak": 0, "waited": 0.0}
+		self.__cond = Condition(allocate_lock())
+		self.__queue = []
+		self.__lanes = {}
+		self.__size = 0
+		self.__number = 0
+		self.__threads = []
+
+	def __repr__(self):
+		return "<%s(%s, %d/%d, queue=%d, lanes=%d)>" % (self.__class__.__name__, self.name, self.busy, self.workers, self.__size, len(self.__lanes))
+
+	def start(self):
+		with self.__cond:
+			if self.alive:
+				return None
+			self.alive = True
+		for numb in xrange(1, self.workers + 1):
+			thr = Worker(self, "%s-%d" % (self.name, numb))
+			thr.start()
+			self.__threads.append(thr)
+
+	def stop(self):
+		with self.__cond:
+			self.alive = False
+			del self.__queue[:]
+			self.__lanes.clear()
+			self.__size = 0
+			self.__cond.notify_all()
+		self.__threads = []
+
+	def put(self, function, args = (), priority = 0, lane = None, force = False):
+		"""
+		Tasks sharing a lane are executed one by one in the order of arrival,
+		whatever priority the other tasks of this lane have.
+		A "forced" task is queued even if the queue is over the limit.
+		"""
+		with self.__cond:
+			if not self.alive:
+				self.stats["overflow"] += 1
+				return False
+			if self.__size >= self.limit:
+				self.stats["overflow"] += 1
+				if not force:
+					return False
+				self.stats["forced"] += 1
+			self.__number += 1
+			task = (priority, self.__number, time.time(), function, args, lane)
+			if lane is None:
+				heappush(self.__queue, task)
+			elif lane in self.__lanes:
+				self.__lanes[lane].append(task)
+			else:
+				self.__lanes[lane] = deque()
+				heappush(self.__queue, task)
+			self.__size += 1
+			self.stats["put"] += 1
+			if self.__size > self.stats["peak"]:
+				self.stats["peak"] = self.__size
+			self.__cond.notify()
+		return True
+
+	def qsize(self):
+		return self.__size
+
+	def isFull(self):
+		return (self.__size >= self.limit)
+
+	def lanes(self):
+		return len(self.__lanes)
+
+	def _loop(self):
+		while True:
+			with self.__cond:
+				while self.alive and not self.__queue:
+					self.__cond.wait()
+				if not self.alive:
+					break
+				(priority, number, date, function, args, lane) = heappop(self.__queue)
+				self.__size -= 1
+				self.stats["waited"] += (time.time() - date)
+				self.busy += 1
+			try:
+				function(*args)
+			except Exception:
+				try:
+					sys.stderr.write("Exception in %s:\n%s\n" % (self.name, get_exc()))
+				except Exception:
+					pass
+			finally:
+				sys.exc_clear()
+				with self.__cond:
+					self.busy -= 1
+					self.stats["done"] += 1
+					if lane is not None:
+						tasks = self.__lanes.get(lane)
+						if tasks:
+							heappush(self.__queue, tasks.popleft())
+							self.__cond.notify()
+						elif tasks is not None:
+							del self.__lanes[lane]
+
 class MainThread(Thread):
 
 	def __init__(self):
@@ -582,6 +1020,7 @@ class MainThread(Thread):
 		self._set_ident()
 		with active_limbo_lock:
 			ActiveThreads[get_ident()] = self
+			_index(self)
 
 	def _set_daemon(self):
 		return False
@@ -612,6 +1051,7 @@ class DummyThread(Thread):
 		self._set_ident()
 		with active_limbo_lock:
 			ActiveThreads[get_ident()] = self
+			_index(self)
 
 	def _set_daemon(self):
 		return True
@@ -636,6 +1076,18 @@ def enumerate():
 
 getNames = lambda: [thr.name for thr in enumerate()]
 
+isNamed = lambda name: (name in ThrNames)
+
+countPrefix = lambda prefix: len(ThrPrefixes.get(prefix, ()))
+
+def getByName(name):
+	with active_limbo_lock:
+		return list(ThrNames.get(name, ()))
+
+def getByPrefix(prefix):
+	with active_limbo_lock:
+		return list(ThrPrefixes.get(prefix, ()))
+
 def killAllThreads():
 	for thr in enumerate():
 		if thr.ident != get_ident():
@@ -644,8 +1096,10 @@ def killAllThreads():
 _shutdown = MainThread()._exitfunc
 
 def _after_fork():
-	global active_limbo_lock
+	global active_limbo_lock, TimerScheduler, Waiters
 	active_limbo_lock = allocate_lock()
+	TimerScheduler = None
+	Waiters = local()
 	ActiveNew = {}
 	current = currentThread()
 	with active_limbo_lock:
@@ -658,4 +1112,7 @@ def _after_fork():
 		Thrlimbo.clear()
 		ActiveThreads.clear()
 		ActiveThreads.update(ActiveNew)
+		ThrNames.clear()
+		ThrPrefixes.clear()
+		_index(current)
 		assert len(ActiveThreads) == 1
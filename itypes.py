@@ -18,12 +18,24 @@ except ImportError:
 else:
 	connect = sqlite3.connect
 
+Upsert = bool(sqlite3 and sqlite3.sqlite_version_info >= (3, 24, 0)) # "on conflict do update" support
+
+from collections import deque, OrderedDict
+from thread import allocate_lock, get_ident
+from time import time
+
 __all__ = [
 	"Number",
+	"Counter",
+	"TokenBucket",
+	"RateWindow",
+	"ConnectionPool",
 	"Database"
 ]
 
-__version__ = "0.8"
+__version__ = "0.9"
+
+checkpoint = lambda: None # cancellation hook, BlackSmith sets it to ithr.checkpoint
 
 class Number(object):
 
@@ -62,6 +74,152 @@ class Number(object):
 
 	__le__ = lambda self, number: self.number <= number
 
+class Counter(Number):
+
+	"""
+	Thread-safe counter: every thread increments its own cell, cells are merged on reading.
+	plus() & reduce() return nothing (the total is read explicitly, it costs a pass over the cells).
+	sample() stores the current value, rate() calculates the speed between samples.
+	"""
+
+	def __init__(self, number = int(), history = 61):
+		self.base = number
+		self.cells = {}
+		self.samples = deque(maxlen = history)
+
+	@property
+	def number(self):
+		number = self.base
+		for cell in self.cells.values(): # a copy, other threads may add cells meanwhile
+			number += cell[0]
+		return number
+
+	def plus(self, number = 0x1):
+		cell = self.cells.get(get_ident())
+		if cell is None:
+			cell = self.cells.setdefault(get_ident(), [0])
+		cell[0] += number
+
+	def reduce(self, number = 0x1):
+		self.plus(-number)
+
+	def __int__(self):
+		return self.number
+
+	def __eq__(self, number):
+		return self.number == number
+
+	def __ne__(self, number):
+		return self.number != number
+
+	def __gt__(self, number):
+		return self.number > number
+
+	def __lt__(self, number):
+		return self.number < number
+
+	def __ge__(self, number):
+		return self.number >= number
+
+	def __le__(self, number):
+		return self.number <= number
+
+	def sample(self):
+		self.samples.append((time(), self.number))
+
+	def rate(self, window = 1):
+		samples = list(self.samples)
+		if len(samples) < 2:
+			return 0.0
+		date, number = samples[-1]
+		for date_, number_ in reversed(samples[:-1]):
+			if (date - date_) >= window:
+				break
+		if date == date_:
+			return 0.0
+		return float(number - number_) / (date - date_)
+
+class TokenBucket(object):
+
+	"""
+	Token bucket: "rate" tokens per second, "burst" tokens at most (zero rate means no limit).
+	Not thread-safe, should be used under the owner's lock.
+	"""
+
+	def __init__(self, rate, burst = 0x1):
+		self.rate = float(rate)
+		self.burst = float(max(burst, 0x1))
+		self.tokens = self.burst
+		self.date = time()
+
+	def update(self):
+		date = time()
+		self.tokens = min(self.burst, self.tokens + (date - self.date) * self.rate)
+		self.date = date
+
+	def delay(self, number = 0x1):
+		if not self.rate:
+			return 0.0
+		self.update()
+		return max(0.0, (min(number, self.burst) - self.tokens) / self.rate)
+
+	def take(self, number = 0x1):
+		if self.delay(number):
+			return False
+		if self.rate:
+			self.tokens -= number
+		return True
+
+	isFull = lambda self: not self.delay(self.burst)
+
+class RateWindow(object):
+
+	"""
+	Ring of the last "size" events (dates and optional values), memory doesn't grow with the rate.
+	burst(number, period) tells whether the last "number" events fit into "period" seconds,
+	check() also forgets all the events but the last one if so.
+	"""
+
+	__slots__ = ("size", "dates", "values", "index", "count")
+
+	def __init__(self, size = 0x8):
+		self.size = size
+		self.dates = [0.0] * size
+		self.values = [None] * size
+		self.index = self.count = 0
+
+	def add(self, value = None, date = None):
+		self.dates[self.index] = date or time()
+		self.values[self.index] = value
+		self.index = (self.index + 1) % self.size
+		if self.count < self.size:
+			self.count += 1
+
+	def last(self, number = 0x1):
+		number = min(number, self.count)
+		return [self.values[(self.index - x) % self.size] for x in xrange(1, number + 1)]
+
+	def burst(self, number, period):
+		number = min(number, self.size)
+		if number > self.count:
+			return False
+		return (self.dates[(self.index - 1) % self.size] - self.dates[(self.index - number) % self.size]) <= period
+
+	def check(self, number, period):
+		if self.burst(number, period):
+			self.count = 1
+			return True
+		return False
+
+	def hit(self, number, period, value = None):
+		self.add(value)
+		return self.check(number, period)
+
+	def clear(self):
+		self.count = 0
+
+	__len__ = lambda self: self.count
+
 class LazyDescriptor(object): # not really lazy, but setter is not needed
 
 	def __init__(self, function):
@@ -69,6 +227,87 @@ class LazyDescriptor(object): # not really lazy, but setter is not needed
 
 	__get__ = lambda self, instance, owner: self.fget(instance)
 
+class ConnectionPool(object):
+
+	"""
+	Keeps idle sqlite3 connections per filename, in order of the last use.
+	A thread checks a connection out for a "with" block (nested blocks of the thread share it, get() tells the depth)
+	and gives it back afterwards, so any thread may reuse it. Idle connections over "size" or unused for "idle" seconds are closed.
+	"""
+
+	def __init__(self, size = 64, statements = 128, idle = 60):
+		self.size = size
+		self.statements = statements
+		self.idle = idle
+		self.lock = allocate_lock()
+		self.files = {}
+		self.order = OrderedDict()
+		self.taken = {}
+
+	def get(self, filename, timeout = 8):
+		key = (filename, get_ident())
+		with self.lock:
+			taken = self.taken.get(key)
+			if taken:
+				taken[1] += 1
+				return tuple(taken)
+			ls = self.files.get(filename)
+			if ls:
+				db = ls.pop()
+				if not ls:
+					del self.files[filename]
+				del self.order[db]
+				self.taken[key] = [db, 1]
+				return (db, 1)
+		db = connect(filename, timeout = timeout, check_same_thread = False, cached_statements = self.statements)
+		try:
+			db.execute("PRAGMA journal_mode = WAL")
+			db.execute("PRAGMA synchronous = NORMAL")
+		except Exception:
+			pass
+		with self.lock:
+			self.taken[key] = [db, 1]
+		return (db, 1)
+
+	def release(self, filename):
+		key = (filename, get_ident())
+		with self.lock:
+			taken = self.taken.get(key)
+			if not taken:
+				return None
+			taken[1] -= 1
+			if taken[1] > 0:
+				return None
+			del self.taken[key]
+			self.files.setdefault(filename, []).append(taken[0])
+			self.order[taken[0]] = (filename, time())
+			self.prune()
+
+	def prune(self):
+		date = time() - self.idle
+		for db, (filename, used) in self.order.items():
+			if len(self.order) <= self.size and used > date:
+				break
+			self.drop(db, filename)
+
+	def drop(self, db, filename):
+		del self.order[db]
+		ls = self.files[filename]
+		ls.remove(db)
+		if not ls:
+			del self.files[filename]
+		db.close()
+
+	def close(self, filename = None):
+		with self.lock:
+			for db, (filename_, used) in self.order.items():
+				if filename in (None, filename_):
+					self.drop(db, filename_)
+
+	__len__ = lambda self: len(self.order) + len(self.taken)
+
+Connections = ConnectionPool()
+
 class Database(object):
 
 	__connected = False
@@ -82,15 +321,19 @@ class Database(object):
 
 		assert not self.__connected, "already connected"
 
-		self.db = connect(self.filename, timeout = self.timeout)
+		self.db, self.depth = Connections.get(self.filename, self.timeout)
 		self.cursor = self.db.cursor()
 		self.__connected = True
 		self.commit = self.db.commit
-		self.execute = self.cursor.execute
+		self.execute = self.__execute
 		self.fetchone = self.cursor.fetchone
 		self.fetchall = self.cursor.fetchall
 		self.fetchmany = self.cursor.fetchmany
 
+	def __execute(self, *args):
+		checkpoint()
+		return self.cursor.execute(*args)
+
 	@LazyDescriptor
 	def execute(self):
 		self.__connect()
@@ -108,26 +351,77 @@ class Database(object):
 		self.__connect()
 		return self.cursor
 
-	def close(self):
+	def close(self, rollback = False):
 
 		assert self.__connected, "not connected"
 
-		if self.cursor:
-			self.cursor.close()
-		if self.db.total_changes:
+		try:
+			if self.cursor:
+				self.cursor.close()
+			if self.depth == 1: # nested blocks of the thread share the transaction of the outermost one
+				if rollback:
+					self.db.rollback()
+				else:
+					self.commit()
+		except Exception:
+			try:
+				self.db.rollback() # the pooled connection must not keep the transaction
+			except Exception:
+				pass
+			raise
+		finally:
+			Connections.release(self.filename)
+
+	def migrate(self, steps, args = {}):
+		"""
+		Executes the steps (sequences of sql statements or functions taking the database) the database has not passed yet.
+		Schema version is kept in "user_version" pragma, "args" are the named parameters of the statements.
+		Every step runs in its own explicit transaction, as sqlite3 module commits implicitly before DDL.
+		"""
+		self.execute("pragma user_version")
+		version = self.fetchone()[0]
+		self.commit()
+		level, self.db.isolation_level = self.db.isolation_level, None
+		try:
+			for version, step in enumerate(steps[version:], version + 1):
+				self.execute("begin immediate")
+				try:
+					if callable(step):
+						step(self)
+					else:
+						for sql in step:
+							self.execute(sql, args)
+					self.execute("pragma user_version = %d" % (version))
+				except:
+					self.cursor.execute("rollback")
+					raise
+				self.execute("commit")
+		finally:
+			self.db.isolation_level = level
+		return version
+
+	def absorb(self, filename, table):
+		"""
+		Copies the rows of the table from another database file (rows with existing keys are skipped).
+		"""
+		self.execute("attach database ? as absorbed", (filename,))
+		try:
+			self.execute("insert or ignore into %s select * from absorbed.%s" % (table, table))
+		finally:
 			self.commit()
-		if self.db:
-			self.db.close()
+			self.cursor.execute("detach database absorbed")
 
 	def __enter__(self):
 		if self.lock:
 			self.lock.acquire()
 		return self
 
-	def __exit__(self, *args):
-		if self.lock:
-			self.lock.release()
-		if self.__connected:
-			self.close()
+	def __exit__(self, exc_type, *args):
+		try:
+			if self.__connected:
+				self.close(exc_type is not None)
+		finally:
+			if self.lock:
+				self.lock.release()
 
 del LazyDescriptor
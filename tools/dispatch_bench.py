@@ -0,0 +1,77 @@
+# coding: utf-8
+
+"""
+Stanza throughput of xmpp.dispatcher.Dispatcher.dispatch with and without the handler chains cache.
+
+Usage: python tools/dispatch_bench.py [stanzas]
+"""
+
+import os, sys, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import xmpp
+
+Stanzas = (
+	"<message xmlns='jabber:client' from='room@conference.example.com/nick' to='bot@example.com/res' type='groupchat' id='m1'><body>hello all</body></message>",
+	"<message xmlns='jabber:client' from='user@example.com/home' to='bot@example.com/res' type='chat' id='m2'><body>help</body><active xmlns='http://jabber.org/protocol/chatstates'/></message>",
+	"<presence xmlns='jabber:client' from='room@conference.example.com/nick' to='bot@example.com/res'><x xmlns='http://jabber.org/protocol/muc#user'><item affiliation='none' role='participant' jid='user@example.com/home'/></x><c xmlns='http://jabber.org/protocol/caps' node='http://example.com' ver='1.0'/></presence>",
+	"<iq xmlns='jabber:client' from='user@example.com/home' to='bot@example.com/res' type='get' id='i1'><query xmlns='jabber:iq:version'/></iq>",
+	"<iq xmlns='jabber:client' from='example.com' to='bot@example.com/res' type='get' id='i2'><ping xmlns='urn:xmpp:ping'/></iq>",
+	"<iq xmlns='jabber:client' from='room@conference.example.com' to='bot@example.com/res' type='result' id='i3'/>"
+)
+
+class Owner(object):
+	defaultNamespace = xmpp.NS_CLIENT
+	_route = 0
+
+class Stream(object):
+	_mini_dom = None
+
+class NoCache(dict):
+
+	def __setitem__(self, key, value):
+		pass
+
+def handler(disp, stanza):
+	pass
+
+def processed(disp, stanza):
+	raise xmpp.NodeProcessed()
+
+def get_dispatcher(cache):
+	disp = xmpp.dispatcher.Dispatcher()
+	disp._owner, disp.Stream = Owner(), Stream()
+	disp.DEBUG = lambda *args: None
+	disp.debugging = lambda: False
+	disp._init()
+	if not cache:
+		disp._chains = NoCache()
+	for name in ("message", "presence", "iq"):
+		disp.RegisterHandler(name, handler)
+	disp.RegisterHandler("iq", handler, "get", xmpp.NS_VERSION)
+	disp.RegisterHandler("iq", handler, "get", xmpp.NS_PING)
+	disp.RegisterHandler("iq", handler, "result")
+	disp.RegisterHandler("presence", handler, "", xmpp.NS_MUC_USER)
+	disp.RegisterHandler("message", handler, "groupchat")
+	disp.RegisterHandler("message", processed, "chat")
+	return disp
+
+def measure(cache, nodes, count):
+	disp = get_dispatcher(cache)
+	start = time.time()
+	for x in xrange(count):
+		disp.dispatch(nodes[x % len(nodes)])
+	return count / (time.time() - start)
+
+def main():
+	count = int(sys.argv[1]) if sys.argv[1:] else 60000
+	nodes = [xmpp.simplexml.XML2Node(x) for x in Stanzas]
+	results = {}
+	for cache in (False, True):
+		results[cache] = measure(cache, nodes, count)
+		print "chains cache %-3s %8.0f stanzas/s" % ("on" if cache else "off", results[cache])
+	print "cache is %.2fx faster" % (results[True] / results[False])
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,77 @@
+# coding: utf-8
+
+"""
+Latency and CPU cost of the ithr waiting primitives (Event, Condition, Semaphore).
+The stdlib threading module (sleep polling on Python 2) is measured as the baseline.
+
+Usage: python tools/ithr_bench.py [rounds]
+"""
+
+import os, sys, time, resource, threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ithr
+
+def cpu_time():
+	usage = resource.getrusage(resource.RUSAGE_SELF)
+	return usage.ru_utime + usage.ru_stime
+
+def primitives(module):
+	event = module.Event()
+	yield ("Event", lambda: event.wait(5), event.set, event.clear)
+	cond, flag = module.Condition(), []
+	def cond_wait():
+		with cond:
+			while not flag:
+				cond.wait(5)
+			flag.pop()
+	def cond_notify():
+		with cond:
+			flag.append(True)
+			cond.notify()
+	yield ("Condition", cond_wait, cond_notify, lambda: None)
+	sem = module.Semaphore(0)
+	yield ("Semaphore", sem.acquire, sem.release, lambda: None)
+
+def wake_latency(wait, signal, reset, rounds):
+	"""
+	Another thread signals after 2 ms, the waiter measures how soon it wakes up.
+	"""
+	total = 0.0
+	for x in xrange(rounds):
+		stamp = []
+		def signaller():
+			time.sleep(0.002)
+			stamp.append(time.time())
+			signal()
+		thr = threading.Thread(target = signaller)
+		thr.start()
+		wait()
+		total += time.time() - stamp[0]
+		thr.join()
+		reset()
+	return total / rounds
+
+def timed_wait(module, rounds, timeout = 0.02):
+	"""
+	Waits out the timeout on an Event nobody sets: overshoot and CPU per wait.
+	"""
+	event = module.Event()
+	cpu, start = cpu_time(), time.time()
+	for x in xrange(rounds):
+		event.wait(timeout)
+	elapsed, cpu = time.time() - start, cpu_time() - cpu
+	return (elapsed / rounds - timeout, cpu / rounds)
+
+def main():
+	rounds = int(sys.argv[1]) if sys.argv[1:] else 50
+	for module in (threading, ithr):
+		print "%s:" % (module.__name__)
+		for name, wait, signal, reset in primitives(module):
+			print "  %-9s wake-up latency %7.3f ms" % (name, wake_latency(wait, signal, reset, rounds) * 1000)
+		over, cpu = timed_wait(module, rounds)
+		print "  Event.wait(0.02) overshoot %7.3f ms, cpu %7.3f ms/wait" % (over * 1000, cpu * 1000)
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,54 @@
+# coding: utf-8
+
+"""
+Handler throughput of ithr.KThread in "trace" and "async" kill modes.
+
+Usage: python tools/kthread_bench.py [handlers]
+"""
+
+import os, sys, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ithr
+
+def handler(body):
+	words = body.split()
+	ls = []
+	for x, word in enumerate(words, 1):
+		if word.isdigit():
+			word = str(int(word) * 2)
+		ls.append("%d) %s" % (x, word.lower()))
+	return str.join(chr(10), ls)
+
+def run_handlers(count, body):
+	for x in xrange(count):
+		handler(body)
+
+def measure(mode, count, body):
+	thr = ithr.KThread(target = run_handlers, args = (count, body), kill_mode = mode)
+	start = time.time()
+	thr.start()
+	thr.join()
+	return time.time() - start
+
+def kill_latency(mode):
+	thr = ithr.KThread(target = run_handlers, args = (10 ** 9, "a b c"), kill_mode = mode)
+	thr.start()
+	time.sleep(0.1)
+	start = time.time()
+	thr.kill()
+	thr.join()
+	return time.time() - start
+
+def main():
+	count = int(sys.argv[1]) if sys.argv[1:] else 20000
+	body = "set 10 users to 25 minutes of silence for flood in room 3"
+	results = {}
+	for mode in ("trace", "async"):
+		results[mode] = measure(mode, count, body)
+		print "%-6s %8.0f handlers/s, kill in %.4fs" % (mode, count / results[mode], kill_latency(mode))
+	print "async is %.2fx faster" % (results["trace"] / results["async"])
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,83 @@
+# coding: utf-8
+
+"""
+Replays a room join burst (occupant presences) through xmpp.transports.TCPsocket.receive over a socketpair.
+The old receive loop (1KB reads, select() per chunk, string concatenation) is replayed as the baseline.
+
+Usage: python tools/receive_bench.py [presences] [rounds]
+"""
+
+import os, sys, time, socket, threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from xml.parsers.expat import ParserCreate
+from xmpp import transports
+
+Presence = ("<presence from='room@conference.example.com/user %d' to='bot@example.com/res'>"
+	"<show>away</show><status>Back in a bit</status><priority>5</priority>"
+	"<c xmlns='http://jabber.org/protocol/caps' hash='sha-1' node='http://example.com/client' ver='QgayPKawpkPSDYmwT/WM94uAlu0='/>"
+	"<x xmlns='vcard-temp:x:update'><photo>01b87fcd030b72895ff8e88db57ec525450f000d</photo></x>"
+	"<x xmlns='http://jabber.org/protocol/muc#user'><item affiliation='none' role='participant' jid='user%d@example.com/home'/></x>"
+	"</presence>")
+
+class Owner(object):
+
+	def disconnected(self):
+		pass
+
+def get_socket(sock):
+	conn = transports.TCPsocket()
+	conn._owner = Owner()
+	conn.DEBUG = lambda *args: None
+	conn.debugging = lambda: False
+	conn._sock = sock
+	conn._send = sock.sendall
+	conn._recv = sock.recv
+	conn._recv_into = sock.recv_into
+	conn._buffer = bytearray(transports.RECV_MAX)
+	conn._view = memoryview(conn._buffer)
+	return conn
+
+def receive_old(conn):
+	data = conn._recv(transports.BUFLEN)
+	while conn.pending_data(0):
+		add = conn._recv(transports.BUFLEN)
+		if not add:
+			break
+		data += add
+	return data
+
+def replay(burst, receive):
+	reader, writer = socket.socketpair()
+	conn = get_socket(reader)
+	sender = threading.Thread(target = writer.sendall, args = (burst,))
+	parser = ParserCreate()
+	parser.Parse("<stream:stream xmlns='jabber:client' xmlns:stream='http://etherx.jabber.org/streams'>")
+	start, size, reads, parsing = time.time(), 0, 0, 0.0
+	sender.start()
+	while size < len(burst):
+		data = receive(conn)
+		size += len(data)
+		reads += 1
+		stamp = time.time()
+		parser.Parse(data)
+		parsing += time.time() - stamp
+	elapsed = time.time() - start
+	sender.join()
+	reader.close()
+	writer.close()
+	return (elapsed, elapsed - parsing, reads)
+
+def main():
+	count = int(sys.argv[1]) if sys.argv[1:] else 2000
+	rounds = int(sys.argv[2]) if sys.argv[2:] else 5
+	burst = "".join([Presence % (x, x) for x in xrange(count)])
+	print "burst: %d presences, %d KB" % (count, len(burst) / 1024)
+	for name, receive in (("old loop", receive_old), ("receive()", transports.TCPsocket.receive)):
+		results = [replay(burst, receive) for x in xrange(rounds)]
+		elapsed, reading, reads = min(results)
+		print "%-10s total %7.2f ms, reading %7.2f ms, %5d reads" % (name, elapsed * 1000, reading * 1000, reads)
+
+if __name__ == "__main__":
+	main()
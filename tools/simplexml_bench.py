@@ -0,0 +1,58 @@
+# coding: utf-8
+
+"""
+Serialization speed of xmpp.simplexml nodes over representative outgoing stanzas.
+Another simplexml.py (e.g. an older revision) can be passed to compare with:
+
+	git show <revision>:xmpp/simplexml.py > /tmp/simplexml_old.py
+	python tools/simplexml_bench.py /tmp/simplexml_old.py
+"""
+
+import os, sys, imp, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from xmpp import simplexml
+
+Text = "Line of a book page with <markup> & \"quotes\" in it. Строка текста.\n".decode("utf-8")
+
+def stanzas(module):
+	Node = module.Node
+	caps = Node("presence", {"to": "room@conference.example.com/bot"})
+	caps.setTagData("status", "online")
+	caps.addChild("c", {"node": "http://example.com/caps", "ver": "1.0", "hash": "sha-1"}, namespace = "http://jabber.org/protocol/caps")
+	yield ("presence with caps", caps)
+	for name, lines in (("chat message 2KB", 30), ("book page 64KB", 1000)):
+		message = Node("message", {"to": "user@example.com/home", "type": "chat"})
+		message.setTagData("body", Text * lines)
+		yield (name, message)
+	iq = Node("iq", {"to": "room@conference.example.com", "type": "set"})
+	query = iq.addChild("query", namespace = "http://jabber.org/protocol/muc#admin")
+	for x in xrange(200):
+		query.addChild("item", {"jid": "user%d@example.com" % (x), "affiliation": "outcast"}).setTagData("reason", "wipe & flood")
+	yield ("admin iq, 200 items", iq)
+
+def measure(node, seconds = 0.5):
+	count, start = 0, time.time()
+	while True:
+		node.__str__()
+		count += 1
+		elapsed = time.time() - start
+		if elapsed >= seconds:
+			return elapsed / count
+
+def main():
+	modules = [("current", simplexml)]
+	if sys.argv[1:]:
+		modules.append(("other", imp.load_source("simplexml_other", sys.argv[1])))
+	for label, module in modules:
+		print "%s (%s):" % (label, module.__file__)
+		for name, node in stanzas(module):
+			print "  %-20s %10.1f us" % (name, measure(node) * 1000000)
+	if hasattr(simplexml, "FrozenNode"):
+		frozen = simplexml.FrozenNode("c", {"node": "http://example.com/caps", "ver": "1.0", "hash": "sha-1"})
+		frozen.setNamespace("http://jabber.org/protocol/caps")
+		print "FrozenNode caps      %10.1f us" % (measure(frozen) * 1000000)
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,89 @@
+# coding: utf-8
+
+"""
+Groupchat messages/sec through the "talkers" statistics storage:
+	"fresh" - new sqlite3 connection, update/insert & commit per message (the old way);
+	"pooled" - itypes.Database block per message (pooled WAL connection);
+	"batched" - messages are counted in memory and flushed by one pooled block (as talkers does now).
+
+Usage: python tools/talkers_bench.py [messages] [users]
+"""
+
+import os, sys, time, random, shutil, tempfile, sqlite3
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import itypes
+
+Room = "room@conference.example.com"
+
+Schema = (
+	"create table talkers (room text, jid text, lastnick text, msgs integer default 0, words integer default 0, primary key (room, jid))",
+	"create index talkers_msgs on talkers (room, msgs)",
+	"create index talkers_jid on talkers (jid)"
+)
+
+Update = "update talkers set lastnick=?, msgs=msgs+?, words=words+? where room=? and jid=?"
+
+Insert = "insert into talkers values (?,?,?,?,?)"
+
+def add_talker(execute, cursor, jid, nick, msgs, words):
+	execute(Update, (nick, msgs, words, Room, jid))
+	if not cursor.rowcount:
+		execute(Insert, (Room, jid, nick, msgs, words))
+
+def fresh(filename, messages):
+	for jid, nick, words in messages:
+		db = sqlite3.connect(filename)
+		cursor = db.cursor()
+		add_talker(cursor.execute, cursor, jid, nick, 1, words)
+		db.commit()
+		db.close()
+
+def pooled(filename, messages):
+	for jid, nick, words in messages:
+		with itypes.Database(filename) as db:
+			add_talker(db, db.cursor, jid, nick, 1, words)
+
+def batched(filename, messages, period = 1000):
+	pending = {}
+	for x, (jid, nick, words) in enumerate(messages, 1):
+		if jid in pending:
+			desc = pending[jid]
+			desc[0] = nick
+			desc[1] += 1
+			desc[2] += words
+		else:
+			pending[jid] = [nick, 1, words]
+		if not x % period or x == len(messages):
+			with itypes.Database(filename) as db:
+				for source_, (nick_, msgs, words_) in pending.iteritems():
+					add_talker(db, db.cursor, source_, nick_, msgs, words_)
+			pending.clear()
+
+def main():
+	count = int(sys.argv[1]) if sys.argv[1:] else 2000
+	users = int(sys.argv[2]) if sys.argv[2:] else 50
+	messages = [("user%d@example.com" % (x), "user %d" % (x), random.randint(1, 30)) for x in (random.randrange(users) for y in xrange(count))]
+	folder = tempfile.mkdtemp()
+	try:
+		for name, function in (("fresh", fresh), ("pooled", pooled), ("batched", batched)):
+			filename = os.path.join(folder, "%s.db" % (name))
+			db = sqlite3.connect(filename)
+			for sql in Schema:
+				db.execute(sql)
+			db.commit()
+			db.close()
+			start = time.time()
+			function(filename, messages)
+			elapsed = time.time() - start
+			with itypes.Database(filename) as db:
+				db("select sum(msgs) from talkers")
+				assert db.fetchone()[0] == count
+			print "%-8s %9.0f messages/s" % (name, count / elapsed)
+		itypes.Connections.close()
+	finally:
+		shutil.rmtree(folder)
+
+if __name__ == "__main__":
+	main()
@@ -56,6 +56,12 @@ class NoDebug:
 	def is_active(self, flag):
 		pass
 
+	def enabled(self, flag):
+		return False
+
+	def set_flag(self, flag, state=True):
+		pass
+
 	colors = {}
 
 	def active_set(self, active_flags=None):
@@ -282,6 +288,8 @@ class Debug:
 	colors = {}
 
 	def Show(self, flag, msg, prefix=""):
+		if not self.is_active(flag):
+			return None
 		msg = msg.replace("\r", "\\r").replace("\n", "\\n").replace("><", ">\n  <")
 		if not colors_enabled:
 			pass
@@ -309,6 +317,21 @@ class Debug:
 			return 1
 		return 0
 
+	def enabled(self, flag):
+		"""
+		Cheap check to be done before formatting of debug message.
+		"""
+		return bool(self.active and self.is_active(flag))
+
+	def set_flag(self, flag, state=True):
+		"""
+		Turns output of the single flag on or off.
+		"""
+		active = [item for item in self.active if item != flag]
+		if state != (DBG_ALWAYS in self.active):
+			active.append(flag)
+		self.active = active
+
 DBG_ALWAYS = "always"
 
 # Debug=NoDebug # Uncomment this to effectively disable all debugging and all debugging overhead.
@@ -25,11 +25,14 @@ import simplexml
 import sys
 import time
 
+from thread import allocate_lock
+
 from plugin import PlugIn
 from protocol import *
 from xml.parsers.expat import ExpatError
 
 DefaultTimeout = 25
+ChainsLimit = 512
 ID = 0
 
 DBG_LINE = "dispatcher"
@@ -42,6 +45,9 @@ class Dispatcher(PlugIn):
 	def __init__(self):
 		PlugIn.__init__(self)
 		self.handlers = {}
+		self._chains = {}
+		self._chainsGen = 0
+		self._chainsLock = allocate_lock()
 		self._expected = {}
 		self._defaultHandler = None
 		self._pendingExceptions = []
@@ -59,6 +65,7 @@ class Dispatcher(PlugIn):
 			self.RegisterProtocol,
 			self.WaitForResponse,
 			self.SendAndWaitForResponse,
+			self.prepare,
 			self.send,
 			self.SendAndCallForResponse,
 			self.disconnect,
@@ -72,12 +79,21 @@ class Dispatcher(PlugIn):
 		"""
 		return self.handlers
 
+	def _resetChains(self):
+		"""
+		Drops cached handler chains. Called after every change of handlers.
+		"""
+		with self._chainsLock:
+			self._chainsGen += 1
+			self._chains.clear()
+
 	def restoreHandlers(self, handlers):
 		"""
 		Restores user-registered callbacks structure from dump previously obtained via dumpHandlers.
 		Used within the library to carry user handlers set over Dispatcher replugins.
 		"""
 		self.handlers = handlers
+		self._resetChains()
 
 	def _init(self):
 		"""
@@ -111,6 +127,7 @@ class Dispatcher(PlugIn):
 		"""
 		self.Stream.dispatch = None
 		self.Stream.DEBUG = None
+		self.Stream.debugging = None
 		self.Stream.features = None
 		self.Stream.destroy()
 
@@ -124,6 +141,7 @@ class Dispatcher(PlugIn):
 		self.Stream.stream_header_received = self._check_stream_start
 		self._owner.debug_flags.append(simplexml.DBG_NODEBUILDER)
 		self.Stream.DEBUG = self._owner.DEBUG
+		self.Stream.debugging = self._owner._DEBUG.enabled
 		self.Stream.features = None
 		self._metastream = Node("stream:stream")
 		self._metastream.setNamespace(self._owner.Namespace)
@@ -175,6 +193,7 @@ class Dispatcher(PlugIn):
 		"""
 		self.DEBUG("Registering namespace \"%s\"" % xmlns, order)
 		self.handlers[xmlns] = {}
+		self._resetChains()
 		self.RegisterProtocol("unknown", Protocol, xmlns=xmlns)
 		self.RegisterProtocol("default", Protocol, xmlns=xmlns)
 
@@ -188,6 +207,7 @@ class Dispatcher(PlugIn):
 			xmlns = self._owner.defaultNamespace
 		self.DEBUG("Registering protocol \"%s\" as %s(%s)" % (tag_name, Proto, xmlns), order)
 		self.handlers[xmlns][tag_name] = {"type": Proto, "default": []}
+		self._resetChains()
 
 	def RegisterNamespaceHandler(self, xmlns, handler, typ="", ns="", makefirst=0, system=0):
 		"""
@@ -228,6 +248,7 @@ class Dispatcher(PlugIn):
 			self.handlers[xmlns][name][typ + ns].insert(0, {"func": handler, "system": system})
 		else:
 			self.handlers[xmlns][name][typ + ns].append({"func": handler, "system": system})
+		self._resetChains()
 
 	def RegisterHandlerOnce(self, name, handler, typ="", ns="", xmlns=None, makefirst=0, system=0):
 		"""
@@ -256,6 +277,7 @@ class Dispatcher(PlugIn):
 			self.handlers[xmlns][name][typ + ns].remove(pack)
 		except ValueError:
 			pass
+		self._resetChains()
 
 	def RegisterDefaultHandler(self, handler):
 		"""
@@ -342,6 +364,7 @@ class Dispatcher(PlugIn):
 				raise UnsupportedStanzaType(name)
 		if name == "features":
 			session.Stream.features = stanza
+		debug = self.debugging()
 		xmlns = stanza.getNamespace()
 		if xmlns not in self.handlers:
 			self.DEBUG("Unknown namespace: " + xmlns, "warn")
@@ -349,7 +372,7 @@ class Dispatcher(PlugIn):
 		if name not in self.handlers[xmlns]:
 			self.DEBUG("Unknown stanza: " + name, "warn")
 			name = "unknown"
-		else:
+		elif debug:
 			self.DEBUG("Got %s/%s stanza" % (xmlns, name), "ok")
 		if isinstance(stanza, Node):
 			stanza = self.handlers[xmlns][name]["type"](node=stanza)
@@ -358,19 +381,18 @@ class Dispatcher(PlugIn):
 			typ = ""
 		stanza.props = stanza.getProperties()
 		ID = stanza.getID()
-		session.DEBUG("Dispatching %s stanza with type->%s props->%s id->%s" % (name, typ, stanza.props, ID), "ok")
-		ls = ["default"] # we will use all handlers:
-		if typ in self.handlers[xmlns][name]:
-			ls.append(typ) # from very common...
-		for prop in stanza.props:
-			if prop in self.handlers[xmlns][name]:
-				ls.append(prop)
-			if typ and (typ + prop) in self.handlers[xmlns][name]:
-				ls.append(typ + prop) # ...to very particular
-		chain = self.handlers[xmlns]["default"]["default"]
-		for key in ls:
-			if key:
-				chain = chain + self.handlers[xmlns][name][key]
+		if debug:
+			session.DEBUG("Dispatching %s stanza with type->%s props->%s id->%s" % (name, typ, stanza.props, ID), "ok")
+		key = (xmlns, name, typ, tuple(stanza.props))
+		chain = self._chains.get(key)
+		if chain is None:
+			generation = self._chainsGen
+			chain = self.getChain(xmlns, name, typ, stanza.props)
+			with self._chainsLock: # a chain built while handlers were changing must not be cached
+				if generation == self._chainsGen:
+					if len(self._chains) >= ChainsLimit:
+						self._chains.clear()
+					self._chains[key] = chain
 		output = ""
 		if ID in session._expected:
 			user = 0
@@ -397,6 +419,26 @@ class Dispatcher(PlugIn):
 		if user and self._defaultHandler:
 			self._defaultHandler(session, stanza)
 
+	def getChain(self, xmlns, name, typ, props):
+		"""
+		Return the list of handlers for stanza with given namespace, name, type and children namespaces.
+		Result is cached by dispatch() until handlers are changed.
+		"""
+		handlers = self.handlers[xmlns][name]
+		ls = ["default"] # we will use all handlers:
+		if typ in handlers:
+			ls.append(typ) # from very common...
+		for prop in props:
+			if prop in handlers:
+				ls.append(prop)
+			if typ and (typ + prop) in handlers:
+				ls.append(typ + prop) # ...to very particular
+		chain = list(self.handlers[xmlns]["default"]["default"])
+		for key in ls:
+			if key:
+				chain.extend(handlers[key])
+		return chain
+
 	def WaitForResponse(self, ID, timeout=DefaultTimeout):
 		"""
 		Block and wait until stanza with specific "id" attribute will come.
@@ -434,13 +476,11 @@ class Dispatcher(PlugIn):
 		"""
 		self._expected[self.send(stanza)] = (func, args)
 
-	def send(self, stanza):
+	def prepare(self, stanza):
 		"""
-		Serialize stanza and put it on the wire. Assign an unique ID to it before send.
-		Returns assigned ID.
+		Assign an unique ID, sender and namespace to the stanza (wraps it into route if needed).
+		Returns assigned ID and the stanza to be serialized.
 		"""
-		if isinstance(stanza, basestring):
-			return self._owner_send(stanza)
 		if not isinstance(stanza, Protocol):
 			id = None
 		elif not stanza.getID():
@@ -463,6 +503,16 @@ class Dispatcher(PlugIn):
 			stanza = route
 		stanza.setNamespace(self._owner.Namespace)
 		stanza.setParent(self._metastream)
+		return (id, stanza)
+
+	def send(self, stanza):
+		"""
+		Serialize stanza and put it on the wire. Assign an unique ID to it before send.
+		Returns assigned ID.
+		"""
+		if isinstance(stanza, basestring):
+			return self._owner_send(stanza)
+		id, stanza = self.prepare(stanza)
 		self._owner_send(stanza)
 		return id
 
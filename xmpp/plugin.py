@@ -67,3 +67,10 @@ class PlugIn:
 		Feed a provided debug line to main instance's debug facility along with our ID string.
 		"""
 		self._owner.DEBUG(self.DBG_LINE, text, severity)
+
+	def debugging(self):
+		"""
+		Return True if debug output of this plugin is active.
+		Use it to avoid formatting of debug lines which will not be shown.
+		"""
+		return self._owner._DEBUG.enabled(self.DBG_LINE)
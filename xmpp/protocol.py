@@ -634,10 +634,13 @@ class Protocol(Node):
 		"""
 		Return the list of namespaces to which belongs the direct childs of element.
 		"""
-		props = []
-		for child in self.getChildren():
+		props, known = [], set()
+		for child in self.kids:
+			if child is None:
+				continue
 			prop = child.getNamespace()
-			if prop not in props:
+			if prop not in known:
+				known.add(prop)
 				props.append(prop)
 		return props
 
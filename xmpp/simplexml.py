@@ -21,6 +21,7 @@ I'm personally using it in many other separate projects.
 It is designed to be as standalone as possible.
 """
 
+import re
 import xml.parsers.expat
 
 XML_ls = (
@@ -33,9 +34,13 @@ XML_ls = (
 	("'", "&apos;")
 )
 
+XML_search = re.compile("[%s]" % "".join([char for char, edef in XML_ls])).search
+
 def XMLescape(body):
-	for char, edef in XML_ls:
-		body = body.replace(char, edef)
+	if XML_search(body):
+		for char, edef in XML_ls:
+			if char in body:
+				body = body.replace(char, edef)
 	return body.strip()
 
 ENCODING = "utf-8"
@@ -145,44 +150,53 @@ class Node(object):
 		Method used to dump node into textual representation.
 		if "fancy" argument is set to True produces indented output for readability.
 		"""
-		s = (fancy - 1) * 2 * " " + "<" + self.name
+		out = []
+		self.dump(out, fancy)
+		return "".join(out)
+
+	def dump(self, out, fancy=0):
+		"""
+		Appends textual representation of the node to the "out" list.
+		"""
+		self._dump(out, fancy)
+
+	def _dump(self, out, fancy):
+		out.append((fancy - 1) * 2 * " " + "<" + self.name)
 		if self.namespace:
 			if not self.parent or self.parent.namespace != self.namespace:
 				if "xmlns" not in self.attrs:
-					s = s + " xmlns=\"%s\"" % self.namespace
-		for key in self.attrs.keys():
-			val = ustr(self.attrs[key])
-			s = s + " %s=\"%s\"" % (key, XMLescape(val))
-		s = s + ">"
+					out.append(" xmlns=\"%s\"" % self.namespace)
+		for key, val in self.attrs.items():
+			out.append(" %s=\"%s\"" % (key, XMLescape(ustr(val))))
+		close = len(out)
+		out.append(">")
+		data = self.data
+		text = ""
 		cnt = 0
 		if self.kids:
 			if fancy:
-				s = s + "\n"
+				out.append("\n")
 			for a in self.kids:
-				if not fancy and (len(self.data) - 1) >= cnt:
-					s = s + XMLescape(self.data[cnt])
-				elif (len(self.data) - 1) >= cnt:
-					s = s + XMLescape(self.data[cnt].strip())
+				if len(data) > cnt:
+					out.append(XMLescape(data[cnt]))
 				if isinstance(a, Node):
-					s = s + a.__str__(fancy and fancy + 1)
+					a.dump(out, fancy and fancy + 1)
 				elif a:
-					s = s + a.__str__()
+					out.append(a.__str__())
 				cnt = cnt + 1
-		if not fancy and (len(self.data) - 1) >= cnt:
-			s = s + XMLescape(self.data[cnt])
-		elif (len(self.data) - 1) >= cnt:
-			s = s + XMLescape(self.data[cnt].strip())
-		if not self.kids and s.endswith(">"):
-			s = s[:-1] + " />"
+		if len(data) > cnt:
+			text = XMLescape(data[cnt])
+			out.append(text)
+		if not self.kids and not text:
+			out[close] = " />"
 			if fancy:
-				s = s + "\n"
+				out.append("\n")
 		else:
-			if fancy and not self.data:
-				s = s + (fancy - 1) * 2 * " "
-			s = s + "</" + self.name + ">"
+			if fancy and not data:
+				out.append((fancy - 1) * 2 * " ")
+			out.append("</" + self.name + ">")
 			if fancy:
-				s = s + "\n"
-		return s
+				out.append("\n")
 
 	def getCDATA(self):
 		"""
@@ -482,6 +496,24 @@ class Node(object):
 			return self.NT
 		raise AttributeError()
 
+class FrozenNode(Node):
+	"""
+	Node which is serialized once and then dumped from cache, meant to be shared by many stanzas.
+	It never gets a parent (so its namespace is always written out) and must not be changed after the first dump.
+	"""
+	parent = property(lambda self: None, lambda self, parent: None)
+
+	def dump(self, out, fancy=0):
+		if fancy:
+			self._dump(out, fancy)
+		else:
+			text = self.__dict__.get("_text")
+			if text is None:
+				ls = []
+				self._dump(ls, fancy)
+				text = self._text = "".join(ls)
+			out.append(text)
+
 class T:
 	"""
 	Auxiliary class used to quick access to node's child nodes.
@@ -576,7 +608,8 @@ class NodeBuilder:
 		"""
 		self.check_data_buffer()
 		self._inc_depth()
-		self.DEBUG(DBG_NODEBUILDER, "DEPTH -> %i , tag -> %s, attrs -> %s" % (self.__depth, tag, repr(attrs)), "down")
+		if self.debugging(DBG_NODEBUILDER):
+			self.DEBUG(DBG_NODEBUILDER, "DEPTH -> %i , tag -> %s, attrs -> %s" % (self.__depth, tag, repr(attrs)), "down")
 		if self.__depth == self._dispatch_depth:
 			if not self._mini_dom:
 				self._mini_dom = Node(tag=tag, attrs=attrs, nsp=self._document_nsp, node_built=True)
@@ -611,7 +644,8 @@ class NodeBuilder:
 		"""
 		XML Parser callback. Used internally.
 		"""
-		self.DEBUG(DBG_NODEBUILDER, "DEPTH -> %i , tag -> %s" % (self.__depth, tag), "up")
+		if self.debugging(DBG_NODEBUILDER):
+			self.DEBUG(DBG_NODEBUILDER, "DEPTH -> %i , tag -> %s" % (self.__depth, tag), "up")
 		self.check_data_buffer()
 		if self.__depth == self._dispatch_depth:
 			if self._mini_dom and self._mini_dom.getName() == "error":
@@ -630,7 +664,8 @@ class NodeBuilder:
 		"""
 		XML Parser callback. Used internally.
 		"""
-		self.DEBUG(DBG_NODEBUILDER, data, "data")
+		if self.debugging(DBG_NODEBUILDER):
+			self.DEBUG(DBG_NODEBUILDER, data, "data")
 		if self.last_is_data:
 			if self.data_buffer:
 				self.data_buffer.append(data)
@@ -648,6 +683,12 @@ class NodeBuilder:
 		"""
 		Gets all NodeBuilder walking events. Can be used for debugging if redefined.
 		"""
+
+	def debugging(self, level):
+		"""
+		Tells if DEBUG output for the level is active. Should be redefined along with DEBUG.
+		"""
+		return False
 	def getDom(self):
 		"""
 		Returns just built Node.
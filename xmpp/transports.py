@@ -48,6 +48,7 @@ DATA_SENT = 'DATA SENT'
 DBG_CONNECT_PROXY = 'CONNECTproxy'
 
 BUFLEN = 1024
+RECV_MAX = 65536 # bytes read by the single receive() call
 
 class error:
 	"""
@@ -147,6 +148,9 @@ class TCPsocket(PlugIn):
 			self._sock.connect(server)
 			self._send = self._sock.sendall
 			self._recv = self._sock.recv
+			self._recv_into = self._sock.recv_into
+			self._buffer = bytearray(RECV_MAX)
+			self._view = memoryview(self._buffer)
 		except socket.error as error:
 			try:
 				code, error = error
@@ -169,13 +173,35 @@ class TCPsocket(PlugIn):
 			del self._owner.Connection
 			self._owner.UnregisterDisconnectHandler(self.disconnected)
 
+	def _read(self):
+		"""
+		Reads up to RECV_MAX bytes into the reusable buffer.
+		TLS connection has no recv_into() so it is read by chunks.
+		"""
+		if self._recv_into:
+			return self._view[:self._recv_into(self._buffer, RECV_MAX)].tobytes()
+		data = self._recv(BUFLEN)
+		if data:
+			chunks, size = [data], len(data)
+			while size < RECV_MAX and self.pending_data(0):
+				try:
+					data = self._recv(RECV_MAX - size)
+				except Exception:
+					break
+				if not data:
+					break
+				chunks.append(data)
+				size += len(data)
+			data = "".join(chunks)
+		return data
+
 	def receive(self):
 		"""
-		Reads all pending incoming data.
+		Reads pending incoming data (RECV_MAX bytes at most, the rest is left for the next call).
 		In case of disconnection calls owner's disconnected() method and then raises IOError exception.
 		"""
 		try:
-			data = self._recv(BUFLEN)
+			data = self._read()
 		except socket.sslerror as e:
 			self._seen_data = 0
 			if e[0] in (socket.SSL_ERROR_WANT_READ, socket.SSL_ERROR_WANT_WRITE):
@@ -186,17 +212,10 @@ class TCPsocket(PlugIn):
 			raise IOError("Disconnected!")
 		except Exception:
 			data = ""
-		while self.pending_data(0):
-			try:
-				add = self._recv(BUFLEN)
-			except Exception:
-				break
-			if not add:
-				break
-			data += add
 		if data:
 			self._seen_data = 1
-			self.DEBUG(data, "got")
+			if self.debugging():
+				self.DEBUG(data, "got")
 			if hasattr(self._owner, "Dispatcher"):
 				self._owner.Dispatcher.Event("", DATA_RECEIVED, data)
 		else:
@@ -223,7 +242,8 @@ class TCPsocket(PlugIn):
 		else:
 			if not data.strip():
 				data = repr(data)
-			self.DEBUG(data, "sent")
+			if self.debugging():
+				self.DEBUG(data, "sent")
 			if hasattr(self._owner, "Dispatcher"):
 				self._owner.Dispatcher.Event("", DATA_SENT, data)
 
@@ -323,6 +343,9 @@ class HTTPPROXYsocket(TCPsocket):
 		"""
 		return self._owner.DEBUG(DBG_CONNECT_PROXY, text, severity)
 
+	def debugging(self):
+		return self._owner._DEBUG.enabled(DBG_CONNECT_PROXY)
+
 class TLS(PlugIn):
 	"""
 	TLS connection used to encrypts already estabilished tcp connection.
@@ -383,6 +406,7 @@ class TLS(PlugIn):
 		tcpsock._sslIssuer = tcpsock._sslObj.issuer()
 		tcpsock._sslServer = tcpsock._sslObj.server()
 		tcpsock._recv = tcpsock._sslObj.read
+		tcpsock._recv_into = None
 		tcpsock._send = tcpsock._sslObj.write
 		tcpsock._seen_data = 1
 		self._tcpsock = tcpsock